@@ -0,0 +1,168 @@
+"""
+Headless batch runner.
+
+    python batch.py tasks.jsonl -o results.jsonl [--workers 8] [--policy all]
+
+Each input line is a JSON object with a ``task`` string and an optional
+``id``. Tasks run through engine.AgentEngine, ``--workers`` at a time, with
+an approval policy in place of the interactive prompts. One result line per
+task (status, steps, latency, model/tool call counts) is written as tasks
+finish; progress, server banners, ``-v`` session logs and a throughput
+report go to stderr, so the default stdout output stays valid JSONL.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import sys
+import time
+
+from config import BATCH_WORKERS, BATCH_POLICY
+from engine import AgentEngine, Approver, AgentSession
+from main import start_servers
+from mcp_servers import shutdown_servers
+
+
+# ====================
+# APPROVAL POLICIES
+# ====================
+class PolicyApprover(Approver):
+    """Approves tool calls whose method is in ``allowed`` (``"*"`` for all).
+
+    Calls still have to pass the safety checks first. Nobody answers
+    follow-up questions, so a denied call ends the task.
+    """
+
+    def __init__(self, allowed):
+        self.allowed = set(allowed)
+
+    async def approve(self, session, method, params):
+        return "*" in self.allowed or method in self.allowed
+
+
+POLICIES = {
+    "all": ["*"],
+    "python": ["python.execute", "ai.summarize", "ai.analyze", "ai.generate", "web.search", "web.fetch", "web.fetch_many"],
+    "readonly": ["ai.summarize", "ai.analyze", "ai.generate", "web.search", "web.fetch", "web.fetch_many"],
+    "none": [],
+}
+
+
+# ====================
+# RUNNER
+# ====================
+def load_tasks(path):
+    tasks = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"task": item}
+            if not item.get("task"):
+                raise ValueError(f"{path}:{line_number}: missing 'task'")
+            item.setdefault("id", str(line_number))
+            tasks.append(item)
+    return tasks
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_batch(tasks, output, workers=BATCH_WORKERS, approver=None, verbose=False):
+    """Run ``tasks`` and write one JSON line per task to the ``output`` file.
+
+    Returns the list of result dicts in input order.
+    """
+    results = [None] * len(tasks)
+    slots = asyncio.Semaphore(workers)
+    batch_started = time.monotonic()
+    printer = (lambda text: print(text, file=sys.stderr)) if verbose else (lambda text: None)
+
+    async with AgentEngine(approver or PolicyApprover(POLICIES[BATCH_POLICY]), printer=printer) as engine:
+
+        async def run_one(index, item):
+            async with slots:
+                session = AgentSession(engine, item["task"], name=item["id"])
+                started = time.monotonic()
+                await engine.run_session(session)
+                result = dict(session.summary(), id=item["id"],
+                              started=round(started - batch_started, 3),
+                              latency=round(time.monotonic() - started, 3),
+                              output=session.steps[-1]["output"][:1000] if session.steps else "")
+            results[index] = result
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if not verbose:
+                print(f"[BATCH] {item['id']}: {result['status']} in {result['latency']}s", file=sys.stderr)
+
+        await asyncio.gather(*(run_one(i, item) for i, item in enumerate(tasks)))
+    return results
+
+
+def report(results, elapsed):
+    """Throughput and latency figures for a finished batch."""
+    count = len(results)
+    latencies = [r["latency"] for r in results]
+    statuses = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    return {
+        "tasks": count,
+        "elapsed": round(elapsed, 3),
+        "tasks_per_sec": round(count / elapsed, 3) if elapsed > 0 else None,
+        "latency_p50": percentile(latencies, 0.50) if count else None,
+        "latency_p95": percentile(latencies, 0.95) if count else None,
+        "llm_calls_per_task": round(sum(r["llm_calls"] for r in results) / count, 2) if count else None,
+        "mcp_calls_per_task": round(sum(r["mcp_calls"] for r in results) / count, 2) if count else None,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("tasks", help="JSONL file with one task per line")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default=BATCH_POLICY,
+                        help="which tool calls run without a human")
+    parser.add_argument("--no-servers", action="store_true",
+                        help="use already running MCP servers instead of starting them")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every session's steps")
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.tasks)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    # Anything else printed while the batch runs (server banners from their
+    # threads included) goes to stderr; stdout carries only result lines
+    with contextlib.redirect_stdout(sys.stderr):
+        if not args.no_servers:
+            start_servers()
+        try:
+            started = time.monotonic()
+            results = asyncio.run(run_batch(tasks, output, args.workers, PolicyApprover(POLICIES[args.policy]),
+                                            args.verbose))
+            elapsed = time.monotonic() - started
+        finally:
+            if args.output != "-":
+                output.close()
+            if not args.no_servers:
+                shutdown_servers()
+
+    summary = report(results, elapsed)
+    print(f"\n[BATCH] {summary['tasks']} tasks in {summary['elapsed']}s "
+          f"({summary['tasks_per_sec']} tasks/s), statuses: {summary['statuses']}", file=sys.stderr)
+    print(f"[BATCH] latency p50 {summary['latency_p50']}s, p95 {summary['latency_p95']}s", file=sys.stderr)
+    print(f"[BATCH] per task: {summary['llm_calls_per_task']} LLM calls, "
+          f"{summary['mcp_calls_per_task']} MCP calls", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
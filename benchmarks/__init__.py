@@ -0,0 +1,7 @@
+"""
+Benchmarks for the InnerLink AI Agent.
+
+Run them from the package directory, e.g.::
+
+    python -m benchmarks.bench_safety
+"""
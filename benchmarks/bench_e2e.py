@@ -0,0 +1,275 @@
+"""
+End-to-end benchmark: MCP servers and agent engine against local stand-ins.
+
+    python -m benchmarks.bench_e2e [--calls N] [--sessions 1,4,16] [--llm-latency S] [-o results.json]
+
+Starts FakeOpenAI and FixtureSite (benchmarks.fakes), points the OpenAI
+clients at the fake, starts the MCP servers as batch.py does, and measures:
+- mcp: round trips of tools/list, an 8-item JSON-RPC batch and ai.summarize
+- subprocess: terminal.execute / python.execute round trips, the process's
+  own wall time, and the overhead beyond it (spawn, capture, transport)
+- web: web.fetch of uncached pages, cache hits, and web.fetch_many of 16
+- agent: steps/sec of N concurrent AgentEngine sessions running the fake
+  model's scripted task, with the traced time breakdown per category
+The results are one JSON document (stdout or ``-o``) to compare commits;
+server output and a readable summary go to stderr. HOME points at a
+scratch directory while it runs, so every cache and the trace file start
+empty and the user's own are left alone.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fakes import FakeOpenAI, FixtureSite
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ====================
+# MEASURING
+# ====================
+def stats(samples, errors=0):
+    """Summary of ``samples`` (seconds) in milliseconds."""
+    from batch import percentile
+
+    if not samples:
+        return {"n": 0, "errors": errors}
+    ordered = sorted(samples)
+    return {
+        "n": len(samples),
+        "errors": errors,
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _failed(response):
+    if "error" in response:
+        return True
+    result = response.get("result")
+    if isinstance(result, list):
+        return any(_failed(item) for item in result)
+    return isinstance(result, dict) and result.get("returncode") not in (0, None)
+
+
+def measure(call, count, warmup):
+    """Time ``call(i)`` ``count`` times after ``warmup`` untimed calls.
+
+    ``call`` returns a JSON-RPC response (or a list of them); returns
+    ``(seconds, responses, errors)``.
+    """
+    for i in range(warmup):
+        call(-1 - i)
+    samples, responses, errors = [], [], 0
+    for i in range(count):
+        started = time.perf_counter()
+        response = call(i)
+        samples.append(time.perf_counter() - started)
+        responses.append(response)
+        items = response if isinstance(response, list) else [response]
+        errors += any(_failed(item) for item in items)
+    return samples, responses, errors
+
+
+# ====================
+# SCENARIOS
+# ====================
+def bench_mcp(count, warmup):
+    from mcp_client import rpc, rpc_batch
+
+    results = {}
+    samples, _, errors = measure(lambda i: rpc("terminal", "tools/list"), count, warmup)
+    results["tools/list"] = stats(samples, errors)
+    samples, _, errors = measure(lambda i: rpc_batch("terminal", [("tools/list", None)] * 8), count, warmup)
+    results["batch_8"] = stats(samples, errors)
+    # Distinct texts, so the AI result cache never answers
+    samples, _, errors = measure(
+        lambda i: rpc("ai", "ai.summarize", {"text": f"Benchmark paragraph {i} {time.time_ns()}: " + "data " * 50}),
+        count, warmup)
+    results["ai.summarize"] = stats(samples, errors)
+    return results
+
+
+def bench_subprocess(count, warmup):
+    from mcp_client import rpc
+
+    results = {}
+    for method, params in (("terminal.execute", {"command": "true"}), ("python.execute", {"code": "pass"})):
+        samples, responses, errors = measure(lambda i: rpc(method.split(".")[0], method, params), count, warmup)
+        walls = [response.get("result", {}).get("resources", {}).get("wall_time", 0) for response in responses]
+        results[method] = {
+            "roundtrip": stats(samples, errors),
+            "process_wall": stats(walls),
+            "overhead": stats([max(0.0, total - wall) for total, wall in zip(samples, walls)]),
+        }
+    return results
+
+
+def bench_web(site, count, warmup):
+    from mcp_client import rpc
+
+    results = {}
+    samples, _, errors = measure(lambda i: rpc("web", "web.fetch", {"url": site.article_url(10_000 + i)}),
+                                 count, warmup)
+    results["fetch_miss"] = stats(samples, errors)
+    samples, _, errors = measure(lambda i: rpc("web", "web.fetch", {"url": site.article_url(1)}), count, warmup)
+    results["fetch_hit"] = stats(samples, errors)
+
+    rounds = max(1, count // 10)
+    samples, _, errors = measure(
+        lambda i: rpc("web", "web.fetch_many",
+                      {"urls": [site.article_url(20_000 + i * 16 + j) for j in range(16)]}),
+        rounds, min(warmup, 1))
+    results["fetch_many_16"] = dict(stats(samples, errors),
+                                    pages_per_sec=round(16 * len(samples) / sum(samples), 2) if samples else None)
+    return results
+
+
+def bench_agent(session_counts, run_id):
+    import tracing
+    from engine import AgentEngine, AutoApprover
+
+    async def run(count):
+        async with AgentEngine(AutoApprover(), printer=lambda *args: None) as engine:
+            tasks = [f"benchmark task {run_id}-{count}-{i}" for i in range(count)]
+            started = time.perf_counter()
+            sessions = await engine.run_many(tasks)
+            return time.perf_counter() - started, sessions
+
+    results = {}
+    for count in session_counts:
+        elapsed, sessions = asyncio.run(run(count))
+        steps = sum(len(session.steps) for session in sessions)
+        statuses = {}
+        for session in sessions:
+            statuses[session.status] = statuses.get(session.status, 0) + 1
+        trace_ids = {session.trace_id for session in sessions}
+        traces = [t for t in tracing.summarize(tracing.load_spans([tracing.TRACE_FILE]))
+                  if t["trace_id"] in trace_ids] if os.path.exists(tracing.TRACE_FILE) else []
+        breakdown = {column: round(sum(t["total"][column] for t in traces), 4) for column in tracing.COLUMNS}
+        results[str(count)] = {
+            "sessions": count,
+            "steps": steps,
+            "elapsed_s": round(elapsed, 4),
+            "steps_per_sec": round(steps / elapsed, 2) if elapsed > 0 else None,
+            "tasks_per_sec": round(count / elapsed, 2) if elapsed > 0 else None,
+            "llm_calls": sum(session.llm_calls for session in sessions),
+            "mcp_calls": sum(session.mcp_calls for session in sessions),
+            "statuses": statuses,
+            "time_breakdown_s": breakdown,
+        }
+    return results
+
+
+# ====================
+# RUN
+# ====================
+def start_mcp_servers():
+    """Start the MCP servers like batch.py, plus the web server in the "ports" layout."""
+    from config import MCP_HOST, MCP_LAYOUT, WEB_MCP_PORT
+    from main import start_servers
+    from mcp_servers import start_web_server
+
+    if MCP_LAYOUT != "gateway":
+        threading.Thread(target=start_web_server, args=(MCP_HOST, WEB_MCP_PORT), daemon=True).start()
+    start_servers()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_summary(results):
+    out = sys.stderr
+    for section in ("mcp", "web"):
+        for name, row in results[section].items():
+            print(f"[BENCH] {section:<10} {name:<18} p50 {row.get('p50_ms')}ms  p95 {row.get('p95_ms')}ms  "
+                  f"errors {row['errors']}", file=out)
+    for method, rows in results["subprocess"].items():
+        print(f"[BENCH] subprocess {method:<18} p50 {rows['roundtrip'].get('p50_ms')}ms  "
+              f"overhead p50 {rows['overhead'].get('p50_ms')}ms  errors {rows['roundtrip']['errors']}", file=out)
+    for row in results["agent"].values():
+        print(f"[BENCH] agent      {row['sessions']:>3} session(s)     {row['steps_per_sec']} steps/s  "
+              f"{row['tasks_per_sec']} tasks/s  {row['statuses']}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=50, help="timed calls per MCP measurement")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed calls before each measurement")
+    parser.add_argument("--sessions", default="1,4,16", help="comma-separated concurrent agent session counts")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake model takes per call")
+    parser.add_argument("--page-scale", type=int, default=1, help="size multiplier of the fixture pages")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    args = parser.parse_args()
+    session_counts = [int(n) for n in args.sessions.split(",") if n.strip()]
+    if len(set(session_counts)) != len(session_counts):
+        parser.error(f"--sessions has repeated counts: {args.sessions}")
+
+    scratch = tempfile.mkdtemp(prefix="bench-e2e-")
+    fake_llm = FakeOpenAI(latency=args.llm_latency).start()
+    site = FixtureSite(scale=args.page_scale).start()
+    # Before anything imports config: the OpenAI clients and cache paths are built at import time
+    os.environ.update(HOME=scratch, OPENAI_BASE_URL=fake_llm.base_url,
+                      OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "benchmark"))
+
+    # Server banners and agent output go to stderr; stdout carries only the JSON document
+    with contextlib.redirect_stdout(sys.stderr):
+        from agent import configure_llm_cache
+        from config import MCP_LAYOUT
+        from mcp_servers import shutdown_servers
+
+        configure_llm_cache("off")
+        start_mcp_servers()
+        try:
+            started = time.time()
+            results = {
+                "mcp": bench_mcp(args.calls, args.warmup),
+                "subprocess": bench_subprocess(args.calls, args.warmup),
+                "web": bench_web(site, args.calls, args.warmup),
+                "agent": bench_agent(session_counts, int(started)),
+            }
+        finally:
+            shutdown_servers()
+            fake_llm.close()
+            site.close()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    document = {
+        "benchmark": "e2e",
+        "git_commit": git_commit(),
+        "started_at": round(started, 3),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": dict(vars(args), sessions=session_counts, mcp_layout=MCP_LAYOUT),
+        "fake_llm_requests": fake_llm.requests,
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: streaming html_extract vs. the original regex extraction.
+
+    python -m benchmarks.bench_html_extract [--scale N] [--repeat N]
+
+Pages are generated in the shape of real sites: a head full of inline
+scripts and JSON state, a navigation menu with hundreds of links, the
+article or listing itself, a comment thread and a footer. ``--scale``
+multiplies the amount of every part. For each fixture the benchmark times
+the original regex cascade (kept here as the baseline), html_extract with
+its default early stop, and html_extract reading the whole page, and shows
+how much of the extracted text falls inside the article.
+"""
+import argparse
+import random
+import re
+import time
+
+from html_extract import extract_text
+
+WORDS = ("market revenue quarter growth analyst report customer product launch team data model "
+         "pipeline release users region forecast margin strategy platform research results").split()
+
+
+def legacy_extract_generic_info(html):
+    """The original WebMCPHandler.extract_generic_info, kept as the baseline."""
+    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
+    patterns = [
+        r'<h[1-6][^>]*>([^<]*)</h[1-6]>',
+        r'<p[^>]*>(.*?)</p>',
+        r'<div[^>]*class="[^"]*content[^"]*"[^>]*>(.*?)</div>',
+        r'<div[^>]*class="[^"]*main[^"]*"[^>]*>(.*?)</div>',
+        r'<article[^>]*>(.*?)</article>',
+        r'<section[^>]*>(.*?)</section>'
+    ]
+    extracted = []
+    for pattern in patterns:
+        matches = re.findall(pattern, html, re.IGNORECASE | re.DOTALL)
+        for match in matches[:2]:
+            clean_text = re.sub(r'<[^>]+>', '', match)
+            clean_text = re.sub(r'\s+', ' ', clean_text)
+            clean_text = clean_text.strip()
+            if len(clean_text) > 20:
+                extracted.append(clean_text)
+    if extracted:
+        return "\n\n".join(extracted[:10])
+    text_content = re.sub(r'<[^>]+>', '', html)
+    text_content = re.sub(r'\s+', ' ', text_content)
+    return text_content[:2000]
+
+
+# ====================
+# FIXTURES
+# ====================
+def sentence(rng, marker=""):
+    return marker + " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 30))).capitalize() + "."
+
+
+def page_head(rng, scale):
+    scripts = "".join(
+        f"<script>window.__chunk{i}=function(a,b){{return a<b?'<p>'+a+'</p>':b}};"
+        f"var s{i}='{'x' * 2000}';</script>\n" for i in range(20 * scale)
+    )
+    state = '<script type="application/json">{"items":[' + ",".join(
+        f'{{"id":{i},"html":"<div class=\\"content\\">{sentence(rng)}</div>"}}' for i in range(200 * scale)
+    ) + "]}</script>\n"
+    styles = "<style>" + "".join(f".c{i}{{margin:{i}px}}" for i in range(500 * scale)) + "</style>\n"
+    return f"<head><title>Quarterly results</title>{styles}{scripts}{state}</head>\n"
+
+
+def nav(rng, scale):
+    items = "".join(f'<li><a href="/s/{i}">Section {i}</a></li>' for i in range(150 * scale))
+    return f'<header class="masthead"><nav class="main-nav"><ul>{items}</ul></nav></header>\n'
+
+
+def footer(rng, scale, paragraph="p"):
+    links = "".join(f'<a href="/f/{i}">Link {i}</a> ' for i in range(100 * scale))
+    return (f'<footer class="site-footer"><{paragraph}>{links}</{paragraph}>'
+            f'<{paragraph}>{sentence(rng)}</{paragraph}></footer>\n')
+
+
+def comments(rng, scale):
+    return '<section class="comments">' + "".join(
+        f'<div class="comment"><p>{sentence(rng)}</p></div>' for _ in range(100 * scale)
+    ) + "</section>\n"
+
+
+def news_article(rng, scale):
+    body = "".join(f"<p>{sentence(rng, '[A] ')} {sentence(rng, '[A] ')}</p>\n" for _ in range(60 * scale))
+    return ("<html>" + page_head(rng, scale) + "<body>" + nav(rng, scale)
+            + f'<main><article class="post"><h1>Quarterly results</h1>{body}</article></main>'
+            + comments(rng, scale) + footer(rng, scale) + "</body></html>")
+
+
+def listing(rng, scale):
+    cards = "".join(
+        f'<div class="card"><div class="content"><h3>Item {i}</h3><div class="main-text">'
+        f'<span>{sentence(rng, "[A] ")}</span></div></div></div>\n' for i in range(400 * scale)
+    )
+    return ("<html>" + page_head(rng, scale) + "<body>" + nav(rng, scale)
+            + f'<div id="content">{cards}</div>' + footer(rng, scale) + "</body></html>")
+
+
+def legacy_markup(rng, scale):
+    # Old CMS output: <p> is never closed, tables for layout, unclosed divs.
+    # Every unclosed <p> makes the regex scan to the end of the page.
+    rows = "".join(
+        f'<tr><td class="content"><p>{sentence(rng, "[A] ")}<p>{sentence(rng, "[A] ")}</td></tr>\n'
+        for _ in range(300 * scale)
+    )
+    return ("<html>" + page_head(rng, scale) + "<body>" + nav(rng, scale)
+            + f'<div class="content"><table>{rows}</table>' + footer(rng, scale, "span") + "</body></html>")
+
+
+FIXTURES = {"news_article": news_article, "listing": listing, "legacy_markup": legacy_markup}
+
+
+# ====================
+# RUN
+# ====================
+def timed(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = fn(html)
+        best = min(best, time.perf_counter() - started)
+    return best, text
+
+
+def content_share(text):
+    """Fraction of extracted sentences that come from the article itself."""
+    sentences = [s for s in re.split(r"(?<=\.)\s+", text) if len(s) > 20]
+    if not sentences:
+        return 0.0
+    return sum("[A]" in s for s in sentences) / len(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    variants = {
+        "regex (original)": legacy_extract_generic_info,
+        "streaming": extract_text,
+        "streaming, full page": lambda html: extract_text(html, max_chars=10 ** 9),
+    }
+    print(f"{'fixture':<14} {'size':>8}  {'extractor':<22} {'time':>9} {'chars':>7} {'article':>8}")
+    for name, build in FIXTURES.items():
+        html = build(rng, args.scale)
+        for label, fn in variants.items():
+            seconds, text = timed(fn, html, args.repeat)
+            print(f"{name:<14} {len(html) / 1e6:>6.2f}MB  {label:<22} {seconds * 1000:>7.1f}ms "
+                  f"{len(text):>7} {content_share(text):>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: tokens sent to the model over a chain of failed retries.
+
+    python -m benchmarks.bench_retry_history [--attempts N] [--stderr-lines N]
+
+Each simulated attempt fails with a long traceback; every few attempts fail
+with exactly the same output. For every retry the benchmark builds the
+prompt execute_single_step would send, once with the original format (every
+previous attempt with full stdout/stderr) and once with context.RetryMemory,
+and reports the largest prompt and the total tokens over the chain.
+The original total grows quadratically with the number of attempts;
+RetryMemory's grows linearly.
+"""
+import argparse
+
+from context import RetryMemory
+from text_chunking import count_tokens
+
+PROMPT = "Parse the sales CSV in ~/Downloads and plot revenue per month"
+
+
+def legacy_retry_prompt(history, prompt):
+    """The original prompt format, kept here as the baseline."""
+    return (
+        f"The previous command failed. Here is the history:\n\n"
+        + "\n\n".join([
+            f"Attempt {i+1}:\n"
+            f"Method: {step['method']}\n"
+            f"Command/Code: {step['command']}\n"
+            f"Return Code: {step['returncode']}\n"
+            f"STDOUT:\n{step['stdout']}\n"
+            f"STDERR:\n{step['stderr']}"
+            for i, step in enumerate(history)
+        ])
+        + f"\n\nPlease suggest a corrected approach for:\n\"{prompt}\""
+    )
+
+
+def make_attempt(i, stderr_lines):
+    # Every third attempt repeats the previous error verbatim
+    variant = i - (i % 3)
+    traceback = "\n".join(
+        f'  File "/usr/lib/python3/site-packages/pandas/io/parsers.py", line {100 + n}, in read_{variant}'
+        for n in range(stderr_lines)
+    )
+    return {
+        "method": "python.execute",
+        "command": f"import pandas as pd\ndf = pd.read_csv('sales_{variant}.csv')\nprint(df.head())",
+        "returncode": 1,
+        "stdout": "loading...\n" * 5,
+        "stderr": f"Traceback (most recent call last):\n{traceback}\nFileNotFoundError: sales_{variant}.csv",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=50)
+    parser.add_argument("--stderr-lines", type=int, default=200)
+    args = parser.parse_args()
+
+    history = []
+    memory = RetryMemory()
+    legacy_total = legacy_max = bounded_total = bounded_max = 0
+    checkpoints = {}
+    for i in range(args.attempts):
+        attempt = make_attempt(i, args.stderr_lines)
+        history.append(attempt)
+        memory.add(attempt["method"], attempt["command"], attempt["returncode"],
+                   attempt["stdout"], attempt["stderr"])
+
+        legacy = count_tokens(legacy_retry_prompt(history, PROMPT))
+        bounded = count_tokens(memory.retry_prompt(PROMPT))
+        legacy_total += legacy
+        bounded_total += bounded
+        legacy_max = max(legacy_max, legacy)
+        bounded_max = max(bounded_max, bounded)
+        if i + 1 in (5, 10, 25, 50, 100) or i + 1 == args.attempts:
+            checkpoints[i + 1] = (legacy_total, bounded_total)
+
+    print(f"{args.attempts} failed attempts, {args.stderr_lines}-line tracebacks")
+    print(f"{'retries':>8} {'legacy total':>14} {'bounded total':>14}")
+    for n, (legacy, bounded) in checkpoints.items():
+        print(f"{n:>8} {legacy:>14,} {bounded:>14,}")
+    print(f"largest prompt: legacy {legacy_max:,} tokens, bounded {bounded_max:,} tokens")
+    print(f"total reduction: {legacy_total / bounded_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: compiled, cached safety engine vs. the original substring scan.
+
+    python -m benchmarks.bench_safety [--commands N] [--unique N]
+
+Against the original lowercase + per-keyword substring scan (which blocks
+far less), two rates are reported over the same corpus:
+- cold: the check itself with no cache (command_verdict.__wrapped__), as for
+        every new command the agent writes
+- warm: command_verdict with the cache filled by one pass over the distinct
+        commands, as when the server re-checks a command the agent already
+        checked, or the agent retries a command
+plus the cost of one agent step on new commands, where every command is
+checked twice (by the agent, then by the terminal server).
+"""
+import argparse
+import random
+import time
+
+from safety import command_verdict, DANGEROUS_KEYWORDS
+
+TEMPLATES = [
+    "ls -la {path}", "cat {path}/README.md", "grep -rn '{word}' {path}", "find {path} -name '*.py'",
+    "df -h", "du -sh {path}", "ps aux | grep {word} | head -n 5", "echo \"{word} done\"",
+    "python3 -c 'print(\"{word}\")'", "git -C {path} log --oneline | head", "wc -l {path}/*.txt",
+    "tar -czf /tmp/{word}.tgz {path} && echo ok", "sort {path}/data.csv | uniq -c | sort -rn",
+    "FOO={word} env | grep FOO", "mkdir -p {path}/{word} && cd {path}/{word} && ls",
+    "rm -rf {path}", "curl -s https://example.com/{word}", "bash -c 'r''m -rf {path}'",
+    "echo $(kill -9 1)", "sudo reboot", "dd if=/dev/zero of={path}/x bs=1M count=1",
+]
+WORDS = ["alpha", "report", "error", "build", "jobs", "notes", "cache", "pipeline"]
+PATHS = ["~/projects", "/tmp", "./src", "/var/log", "~/Downloads", "../data"]
+
+
+def legacy_is_command_safe(command: str) -> bool:
+    """The original implementation, kept here as the baseline."""
+    return not any(keyword in command.lower() for keyword in DANGEROUS_KEYWORDS)
+
+
+def build_corpus(total, unique, seed=0):
+    rng = random.Random(seed)
+    distinct = list({
+        rng.choice(TEMPLATES).format(path=rng.choice(PATHS), word=rng.choice(WORDS)) + f" # {i}"
+        for i in range(unique)
+    })
+    return [rng.choice(distinct) for _ in range(total)], distinct
+
+
+def _rate(fn, corpus):
+    start = time.perf_counter()
+    for command in corpus:
+        fn(command)
+    elapsed = time.perf_counter() - start
+    return len(corpus) / elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--commands", type=int, default=200_000)
+    parser.add_argument("--unique", type=int, default=2_000)
+    args = parser.parse_args()
+
+    corpus, distinct = build_corpus(args.commands, args.unique)
+
+    legacy_rate, legacy_time = _rate(legacy_is_command_safe, corpus)
+    cold_rate, cold_time = _rate(command_verdict.__wrapped__, corpus)
+
+    command_verdict.cache_clear()
+    _rate(command_verdict, distinct)
+    warm_rate, warm_time = _rate(command_verdict, corpus)
+    info = command_verdict.cache_info()
+
+    # One agent step: agent check + server re-check of the same command
+    legacy_step, _ = _rate(lambda c: (legacy_is_command_safe(c), legacy_is_command_safe(c)), distinct)
+    command_verdict.cache_clear()
+    compiled_step, _ = _rate(lambda c: (command_verdict(c), command_verdict(c)), distinct)
+
+    print(f"corpus: {len(corpus)} commands, {len(distinct)} distinct")
+    print(f"legacy substring scan : {legacy_rate:>12,.0f} cmd/s  ({legacy_time:.3f}s)")
+    print(f"cold (no cache)       : {cold_rate:>12,.0f} cmd/s  ({cold_time:.3f}s)  {cold_rate / legacy_rate:.2f}x legacy")
+    print(f"warm (cached)         : {warm_rate:>12,.0f} cmd/s  ({warm_time:.3f}s)  {warm_rate / legacy_rate:.2f}x legacy, "
+          f"hits={info.hits} misses={info.misses}")
+    print(f"double check, new cmds: legacy {legacy_step:,.0f} steps/s, compiled {compiled_step:,.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Local stand-ins for the services the agent talks to, for benchmarks.
+
+- FakeOpenAI: an OpenAI-compatible endpoint. ``POST /v1/responses`` answers
+  with scripted AgentAction/ToolCall output and ``POST /v1/chat/completions``
+  with a canned reply, each after an optional fixed latency.
+- FixtureSite: HTML article pages for ``web.*`` at ``/article/<n>``, served
+  with ``Cache-Control: max-age`` and an ETag like a real news site.
+
+Both run on ThreadingHTTPServer in daemon threads, on a free local port.
+This module does not import config, so the fakes can be started before
+the OpenAI clients are created.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tool calls the fake model makes for each task, in order; the last one
+# finishes the task. "{n}" is the step number.
+DEFAULT_SCRIPT = [
+    {"method": "terminal.execute", "params": {"command": "echo step {n}", "description": "Print the step"}},
+    {"method": "python.execute", "params": {"code": "print(sum(range(1000)))", "description": "Compute a sum"}},
+    {"method": "terminal.execute", "params": {"command": "echo TASK_COMPLETE", "description": "Finish"}},
+]
+
+_TASK = re.compile(r'CURRENT TASK: "(.*?)"\n', re.DOTALL)
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Otherwise every kept-alive response body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Server:
+    """A threaded HTTP server running ``handler_class`` in a daemon thread."""
+
+    def __init__(self, handler_class, host="127.0.0.1", port=0):
+        self.httpd = _HTTPServer((host, port), handler_class)
+        self.httpd.owner = self
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ====================
+# FAKE OPENAI
+# ====================
+class _OpenAIHandler(_QuietHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake = self.server.owner
+        if fake.latency:
+            time.sleep(fake.latency)
+        if self.path.endswith("/responses"):
+            self.send_json(fake.response(request))
+        elif self.path.endswith("/chat/completions"):
+            self.send_json(fake.chat_completion(request))
+        else:
+            self.send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+
+class FakeOpenAI(_Server):
+    """OpenAI-compatible endpoint replaying ``script`` for every task.
+
+    Each task (found by its ``CURRENT TASK`` line in the prompt) walks
+    through the script on its own, one entry per model call. Requests whose
+    schema is a single ToolCall get just the call.
+    """
+
+    def __init__(self, script=DEFAULT_SCRIPT, latency=0.0, **kwargs):
+        super().__init__(_OpenAIHandler, **kwargs)
+        self.base_url = self.url + "/v1"
+        self.script = script
+        self.latency = latency
+        self.requests = 0
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def next_call(self, prompt):
+        match = _TASK.search(prompt)
+        task = match.group(1) if match else ""
+        with self._lock:
+            self.requests += 1
+            position = self._positions.get(task, 0)
+            self._positions[task] = position + 1
+        call = self.script[min(position, len(self.script) - 1)]
+        params = {name: value.replace("{n}", str(position + 1)) for name, value in call["params"].items()}
+        return {"method": call["method"], "params": params}
+
+    def response(self, request):
+        prompt = "\n".join(item.get("content", "") for item in request.get("input", [])
+                           if isinstance(item, dict) and isinstance(item.get("content"), str))
+        call = self.next_call(prompt)
+        schema_name = ((request.get("text") or {}).get("format") or {}).get("name", "")
+        output = call if schema_name == "ToolCall" else {"calls": [call]}
+        return {
+            "id": f"resp_{random.getrandbits(48):012x}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": request.get("model", "fake"),
+            "status": "completed",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{random.getrandbits(48):012x}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": json.dumps(output), "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {"input_tokens": len(prompt) // 4, "output_tokens": 40, "total_tokens": len(prompt) // 4 + 40,
+                      "input_tokens_details": {"cached_tokens": 0},
+                      "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+
+    def chat_completion(self, request):
+        with self._lock:
+            self.requests += 1
+        prompt = " ".join(m.get("content", "") for m in request.get("messages", []) if isinstance(m, dict))
+        reply = "Summary: " + " ".join(prompt.split()[-40:])
+        return {
+            "id": f"chatcmpl-{random.getrandbits(48):012x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4,
+                      "total_tokens": (len(prompt) + len(reply)) // 4},
+        }
+
+
+# ====================
+# FIXTURE SITE
+# ====================
+class _SiteHandler(_QuietHandler):
+    def do_GET(self):
+        match = re.fullmatch(r"/article/(\d+)", self.path)
+        if not match:
+            self.send_error(404)
+            return
+        body, etag = self.server.owner.page(int(match.group(1)))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", f"max-age={self.server.owner.max_age}")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureSite(_Server):
+    """Deterministic article pages; page ``n`` is the same on every run."""
+
+    def __init__(self, scale=1, max_age=300, **kwargs):
+        super().__init__(_SiteHandler, **kwargs)
+        self.scale = scale
+        self.max_age = max_age
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def page(self, n):
+        # Imported here: it imports config, which must see OPENAI_BASE_URL
+        # pointing at FakeOpenAI before it builds the OpenAI clients.
+        from benchmarks.bench_html_extract import news_article
+        with self._lock:
+            if n not in self._pages:
+                body = news_article(random.Random(n), self.scale).encode()
+                self._pages[n] = (body, f'"a{n}-{len(body)}"')
+            return self._pages[n]
+
+    def article_url(self, n):
+        return f"{self.url}/article/{n}"
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def content_key(*parts) -> str:
+    """Stable SHA-256 key for any JSON-serialisable parts."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+# ====================
+# DISK CACHE
+# ====================
+class DiskCache:
+    """Content-addressed JSON store on disk with size-bounded LRU eviction.
+
+    Entries live at ``<directory>/<key[:2]>/<key>.json``. Reads refresh an
+    entry's mtime, and once the store grows past ``max_bytes`` the least
+    recently used entries are deleted until it is back under 90% of it.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _path, size, _mtime in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value).encode()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        target = self.max_bytes * 0.9
+        for path, size, _mtime in sorted(self._entries(), key=lambda e: e[2]):
+            if self._size <= target:
+                break
+            try:
+                os.unlink(path)
+                self._size -= size
+            except OSError:
+                pass
+
+
+# ====================
+# RESULT CACHE
+# ====================
+class ResultCache:
+    """Memory + optional disk cache with TTL, LRU eviction and single-flight.
+
+    ``get_or_compute(key, compute)`` returns a fresh cached value or runs
+    ``compute()``. Concurrent callers asking for the same missing key wait
+    for the one computation already in flight instead of starting their own.
+    """
+
+    def __init__(self, max_entries, ttl, disk=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}           # key -> Future
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return the value for ``key``. ``cacheable(value)`` decides whether a
+        freshly computed value is stored (e.g. skip error results)."""
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._disk_get(key)
+            if value is not None:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                    self._memory_put(key, value, time.time() + self.ttl)
+            else:
+                with self._lock:
+                    self._stats["misses"] += 1
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, {"expires_at": expires_at, "value": value})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._memory), inflight=len(self._inflight))
+
+    def _memory_get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key):
+        if self.disk is None:
+            return None
+        entry = self.disk.get(key)
+        if entry is None:
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            self.disk.delete(key)
+            return None
+        return entry["value"]
@@ -1,5 +1,6 @@
+import os
 import platform
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 # ====================
 # CONFIG
@@ -15,6 +16,23 @@ PYTHON_MCP_URL = f"http://{MCP_HOST}:{PYTHON_MCP_PORT}"
 AI_MCP_URL = f"http://{MCP_HOST}:{AI_MCP_PORT}"
 WEB_MCP_URL = f"http://{MCP_HOST}:{WEB_MCP_PORT}"
 
+# "gateway" serves every MCP method from one server on MCP_GATEWAY_PORT;
+# "ports" keeps the original layout of one server per port.
+MCP_LAYOUT = "gateway"
+MCP_GATEWAY_PORT = 8000
+MCP_GATEWAY_URL = f"http://{MCP_HOST}:{MCP_GATEWAY_PORT}"
+
+# Method prefix -> server URL, e.g. "python.execute" goes to "python".
+if MCP_LAYOUT == "gateway":
+    MCP_ENDPOINTS = {name: MCP_GATEWAY_URL for name in ("terminal", "python", "ai", "web")}
+else:
+    MCP_ENDPOINTS = {
+        "terminal": TERMINAL_MCP_URL,
+        "python": PYTHON_MCP_URL,
+        "ai": AI_MCP_URL,
+        "web": WEB_MCP_URL,
+    }
+
 
 MODEL = "gpt-4o"
 MAX_RETRIES = 50
@@ -26,7 +44,260 @@ MAX_RETRIES = 50
 
 # === OpenAI client setup ===
 client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
 detected_os = platform.system()
 
-system_prompt_body = """You are an AI agent that can execute terminal commands, Python code, web operations, and AI operations.""" 
\ No newline at end of file
+system_prompt_body = """You are an AI agent that can execute terminal commands, Python code, web operations, and AI operations.""" 
+# ====================
+# MCP SERVING
+# ====================
+# Each MCP server hands requests to a bounded worker pool. Requests beyond
+# MCP_SERVER_WORKERS + MCP_SERVER_QUEUE_SIZE are rejected with a JSON-RPC
+# "server busy" error instead of stalling behind slow handlers.
+MCP_SERVER_WORKERS = 16
+MCP_SERVER_QUEUE_SIZE = 64
+
+# Idle keep-alive connections are closed by the server after this many
+# seconds. An open connection holds one of the MCP_SERVER_WORKERS, so keep
+# this short: clients reconnect cheaply, idle ones must not lock others out.
+MCP_KEEPALIVE_TIMEOUT = 2
+# JSON-RPC batches: items run concurrently, at most MCP_BATCH_WORKERS at a
+# time per server, and a batch may hold up to MCP_BATCH_MAX_ITEMS requests.
+MCP_BATCH_WORKERS = 8
+MCP_BATCH_MAX_ITEMS = 100
+
+# ====================
+# MCP CLIENT
+# ====================
+# Persistent connections kept open per endpoint by the pooled client.
+MCP_POOL_SIZES = {
+    "terminal": 4,
+    "python": 4,
+    "ai": 8,
+    "web": 8,
+}
+MCP_DEFAULT_POOL_SIZE = 4
+# Connections to a server that serves several endpoints (the gateway).
+MCP_GATEWAY_POOL_SIZE = 12
+
+# (connect, read) timeouts in seconds per endpoint. A read timeout of None
+# waits for long-running commands to finish.
+MCP_TIMEOUTS = {
+    "terminal": (3, None),
+    "python": (3, None),
+    "ai": (3, 120),
+    "web": (3, 60),
+}
+MCP_DEFAULT_TIMEOUT = (3, None)
+
+# ====================
+# TOOL DISCOVERY
+# ====================
+# Tool lists are cached for TOOL_REGISTRY_TTL seconds, then revalidated with
+# a cheap etag check. Unreachable servers are skipped with exponential
+# backoff between DEAD_SERVER_BACKOFF and DEAD_SERVER_BACKOFF_MAX seconds.
+TOOL_REGISTRY_TTL = 60
+TOOL_DISCOVERY_TIMEOUT = 5
+DEAD_SERVER_BACKOFF = 5
+DEAD_SERVER_BACKOFF_MAX = 300
+
+# ====================
+# PYTHON WORKER POOL
+# ====================
+# python.execute forks each run from one of PYTHON_POOL_SIZE pre-warmed
+# interpreters that have already imported PYTHON_POOL_PRELOAD (missing
+# modules are skipped). A worker is replaced after PYTHON_POOL_MAX_RUNS runs
+# or if it crashes. Set PYTHON_POOL_SIZE = 0 to spawn a fresh interpreter
+# per call instead.
+PYTHON_POOL_SIZE = 4
+PYTHON_POOL_PRELOAD = ["json", "re", "math", "datetime", "collections", "numpy", "pandas"]
+PYTHON_POOL_MAX_RUNS = 200
+
+# ====================
+# OUTPUT CAPTURE
+# ====================
+# terminal.execute / python.execute keep the first OUTPUT_HEAD_BYTES and the
+# last OUTPUT_TAIL_BYTES of each stream; the middle is dropped. With
+# OUTPUT_SPILL (or params["spill"]) the full stream is also written to a file
+# in OUTPUT_SPILL_DIR (system temp dir when None).
+OUTPUT_HEAD_BYTES = 32 * 1024
+OUTPUT_TAIL_BYTES = 32 * 1024
+OUTPUT_SPILL = False
+OUTPUT_SPILL_DIR = None
+
+# Print terminal/python output live while the agent waits for it.
+MCP_STREAM_OUTPUT = True
+
+# ====================
+# EXECUTION LIMITS
+# ====================
+# Per-method quotas for each terminal/python run. "timeout" is wall-clock
+# seconds, after which the run's whole process group is killed; the rest are
+# rlimits (CPU seconds, data segment in MB, open files). A call may pass a
+# smaller "timeout" in its params. None disables a limit.
+# "processes" (RLIMIT_NPROC) is opt-in: it counts every process and thread
+# the user owns, so on a busy account any value low enough to matter makes
+# every fork in the run fail.
+EXECUTION_LIMITS = {
+    "terminal.execute": {
+        "timeout": 300,
+        "cpu_seconds": 120,
+        "memory_mb": 4096,
+        "open_files": 1024,
+    },
+    "python.execute": {
+        "timeout": 300,
+        "cpu_seconds": 120,
+        "memory_mb": 4096,
+        "open_files": 1024,
+    },
+}
+
+# ====================
+# SAFETY
+# ====================
+# Number of command verdicts kept by safety.command_verdict's LRU cache.
+SAFETY_CACHE_SIZE = 4096
+
+# ====================
+# LLM RESPONSE CACHE
+# ====================
+# call_openai responses can be stored on disk, keyed by a hash of the model,
+# system prompt, input and output schema.
+#   "off"    - always call the API
+#   "cache"  - serve repeated requests from disk, call the API on a miss
+#   "record" - always call the API and store every response
+#   "replay" - serve only recorded responses; a miss raises CacheMiss
+LLM_CACHE_MODE = "off"
+LLM_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "innerlink-agent", "llm")
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# ====================
+# AI MCP SERVER
+# ====================
+AI_MCP_MODEL = "gpt-4o-mini"
+
+# Results of these methods are cached in memory (AI_CACHE_MAX_ENTRIES, LRU)
+# and on disk in AI_CACHE_DIR (None keeps the cache in memory only) for
+# AI_CACHE_TTL seconds. Identical concurrent requests share one upstream call.
+AI_CACHED_METHODS = ("ai.summarize", "ai.analyze", "ai.generate")
+AI_CACHE_MAX_ENTRIES = 1024
+AI_CACHE_TTL = 24 * 60 * 60
+AI_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "innerlink-agent", "ai")
+AI_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# ai.summarize_batch / ai.analyze_batch fan out at most AI_BATCH_CONCURRENCY
+# requests at once by default; callers may ask for up to
+# AI_BATCH_MAX_CONCURRENCY. Batches are limited to AI_BATCH_MAX_ITEMS texts.
+AI_BATCH_CONCURRENCY = 8
+AI_BATCH_MAX_CONCURRENCY = 32
+AI_BATCH_MAX_ITEMS = 500
+
+# Long inputs to ai.summarize / ai.analyze are processed map-reduce style.
+# Inputs up to AI_SINGLE_CALL_TOKENS use one request. Longer ones are cut
+# to AI_MAX_INPUT_TOKENS and split into AI_CHUNK_TOKENS chunks that overlap
+# by AI_CHUNK_OVERLAP_TOKENS. Each chunk is condensed to at most
+# AI_MAP_MAX_TOKENS (AI_MAP_CONCURRENCY at a time), and the notes are
+# reduced at most AI_MAX_REDUCE_ROUNDS times before the final request.
+AI_SINGLE_CALL_TOKENS = 6000
+AI_MAX_INPUT_TOKENS = 120000
+AI_CHUNK_TOKENS = 3000
+AI_CHUNK_OVERLAP_TOKENS = 200
+AI_MAP_MAX_TOKENS = 300
+AI_MAP_CONCURRENCY = 8
+AI_MAX_REDUCE_ROUNDS = 3
+
+# ====================
+# WEB FETCH
+# ====================
+# web.fetch keeps WEB_POOL_SIZE keep-alive connections per host and caches
+# pages (with their extracted text) in WEB_CACHE_DIR, LRU-bounded to
+# WEB_CACHE_MAX_BYTES; None disables the cache. Freshness follows
+# Cache-Control/Expires; pages with only Last-Modified stay fresh for
+# WEB_CACHE_HEURISTIC_FRACTION of their age, at most WEB_CACHE_HEURISTIC_MAX
+# seconds. Stale pages are revalidated with If-None-Match/If-Modified-Since.
+# WEB_FETCH_TIMEOUT bounds a whole fetch (waiting for a connection, the
+# request and reading the body); a body still arriving at the deadline is
+# returned as far as it got. At most WEB_POOL_SIZE requests per host are in
+# flight at once, from all callers together.
+WEB_FETCH_TIMEOUT = 15
+WEB_POOL_SIZE = 4
+# Bodies are streamed in WEB_FETCH_CHUNK_BYTES reads and never more than
+# WEB_FETCH_MAX_BYTES (decoded) are read; binary bodies are not downloaded.
+WEB_FETCH_MAX_BYTES = 5 * 1024 * 1024
+WEB_FETCH_CHUNK_BYTES = 16 * 1024
+WEB_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "innerlink-agent", "web")
+WEB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+WEB_CACHE_MAX_ENTRY_BYTES = 5 * 1024 * 1024
+WEB_CACHE_HEURISTIC_FRACTION = 0.1
+WEB_CACHE_HEURISTIC_MAX = 24 * 60 * 60
+
+# html_extract: stop parsing once HTML_EXTRACT_MAX_CHARS of content has been
+# kept; text blocks of HTML_EXTRACT_MIN_BLOCK_CHARS or fewer (headings aside)
+# are dropped. Whole documents are fed in HTML_EXTRACT_FEED_CHARS slices.
+HTML_EXTRACT_MAX_CHARS = 8000
+HTML_EXTRACT_MIN_BLOCK_CHARS = 20
+HTML_EXTRACT_FEED_CHARS = 64 * 1024
+
+# web.fetch_many downloads WEB_FETCH_MANY_CONCURRENCY URLs at a time by
+# default (callers may ask for up to WEB_FETCH_MANY_MAX_CONCURRENCY), at most
+# WEB_FETCH_MANY_MAX_URLS per call. Extraction runs in HTML_EXTRACT_WORKERS
+# worker processes (0 extracts in the download thread).
+WEB_FETCH_MANY_CONCURRENCY = 16
+WEB_FETCH_MANY_MAX_CONCURRENCY = 32
+WEB_FETCH_MANY_MAX_URLS = 50
+HTML_EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+# ====================
+# CONVERSATION CONTEXT
+# ====================
+# The conversation history in each prompt is capped at CONTEXT_BUDGET_TOKENS.
+# The newest CONTEXT_RECENT_TURNS turns are kept verbatim and older ones are
+# folded into a rolling summary of at most CONTEXT_SUMMARY_TOKENS.
+CONTEXT_BUDGET_TOKENS = 2000
+CONTEXT_RECENT_TURNS = 6
+CONTEXT_SUMMARY_TOKENS = 400
+CONTEXT_SUMMARY_MODEL = "gpt-4o-mini"
+
+# Failed attempts shown to the model on retry: each command/stdout/stderr is
+# clipped to a head and a tail, and the whole history to RETRY_HISTORY_TOKENS.
+RETRY_OUTPUT_HEAD_TOKENS = 200
+RETRY_OUTPUT_TAIL_TOKENS = 300
+RETRY_HISTORY_TOKENS = 3000
+
+# ====================
+# TRACING
+# ====================
+# Every agent task is traced: its stages are timed as spans and appended to
+# TRACE_FILE (see tracing.py; `python tracing.py` prints a breakdown). The
+# file is rotated to TRACE_FILE + ".1" past TRACE_MAX_BYTES.
+TRACE_ENABLED = True
+TRACE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "innerlink-agent", "trace.jsonl")
+TRACE_MAX_BYTES = 64 * 1024 * 1024
+
+# ====================
+# METRICS
+# ====================
+# GET /metrics in the Prometheus text format (see metrics.py), served on its
+# own port next to the MCP servers so scrapes never wait for (or take) one of
+# their workers. None turns the endpoint off.
+METRICS_PORT = 8090
+# Histogram buckets, in seconds, for request latency and subprocess wall time.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# ====================
+# AGENT ENGINE
+# ====================
+# Steps per task, and model/tool calls in flight across all sessions of one
+# engine (see engine.AgentEngine).
+AGENT_MAX_STEPS = 10
+AGENT_MAX_CONCURRENCY = 16
+# Independent tool calls the model may request in one step; they run concurrently.
+AGENT_MAX_PARALLEL_CALLS = 5
+
+# batch.py: tasks run at the same time, and the default approval policy
+# ("all", "python", "readonly" or "none"; safety checks always apply).
+# Running terminal or python calls unattended needs an explicit --policy.
+BATCH_WORKERS = 8
+BATCH_POLICY = "readonly"
@@ -0,0 +1,228 @@
+import threading
+
+from config import (
+    client, CONTEXT_BUDGET_TOKENS, CONTEXT_RECENT_TURNS, CONTEXT_SUMMARY_TOKENS, CONTEXT_SUMMARY_MODEL,
+    RETRY_OUTPUT_HEAD_TOKENS, RETRY_OUTPUT_TAIL_TOKENS, RETRY_HISTORY_TOKENS
+)
+from text_chunking import clip_middle, count_tokens, truncate_to_tokens
+
+
+def llm_summarizer(summary: str, turns: list, max_tokens: int) -> str:
+    """Fold ``turns`` into the running ``summary`` with one model call."""
+    prompt = (
+        "Update the summary of an ongoing session between a user and an agent that runs "
+        "commands for them. Keep user goals, decisions, file names, results and open problems; "
+        f"drop chatter. Answer with the updated summary only, at most {max_tokens} tokens.\n\n"
+        f"CURRENT SUMMARY:\n{summary or '(empty)'}\n\n"
+        "NEW TURNS:\n" + "\n".join(turns)
+    )
+    response = client.chat.completions.create(
+        model=CONTEXT_SUMMARY_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        temperature=0
+    )
+    return response.choices[0].message.content.strip()
+
+
+def _extractive_summary(summary: str, turns: list, max_tokens: int) -> str:
+    """Fallback when the model is unavailable: keep the most recent text."""
+    text = "\n".join(([summary] if summary else []) + turns)
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Keep the tail: newer turns matter more than older ones
+    lines = text.splitlines()
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+class ConversationContext:
+    """Conversation history kept within a token budget.
+
+    The newest ``recent_turns`` turns are kept verbatim. Older turns, and any
+    that would push the verbatim part over the budget, are folded into a
+    rolling summary of at most ``summary_tokens`` tokens. Each fold only sends
+    the previous summary plus the evicted turns, so the cost of a long session
+    stays flat. Token counts are computed once per turn. The summarizer runs
+    outside the lock, so render() does not wait for a model call; evicted
+    turns are rendered verbatim until their fold lands.
+    """
+
+    def __init__(self, budget_tokens=CONTEXT_BUDGET_TOKENS, recent_turns=CONTEXT_RECENT_TURNS,
+                 summary_tokens=CONTEXT_SUMMARY_TOKENS, summarizer=llm_summarizer):
+        self.budget_tokens = budget_tokens
+        self.recent_turns = max(1, recent_turns)
+        self.summary_tokens = min(summary_tokens, budget_tokens // 2)
+        self.summarizer = summarizer
+        self.summary = ""
+        self.folded_turns = 0
+        self._turns = []  # (text, tokens)
+        self._evicted = []  # (text, tokens) waiting to be folded into the summary
+        self._generation = 0  # bumped by reset(), so an older fold is dropped
+        self._summary_tokens_used = 0
+        self._rendered = None
+        self._lock = threading.Lock()
+        self._fold_lock = threading.Lock()  # one summarizer call at a time
+
+    def add(self, role: str, text: str):
+        """Append one turn, e.g. ``add("User", "list my files")``."""
+        turn = f"{role}: {text.strip()}"
+        tokens = count_tokens(turn)
+        turn_budget = self.budget_tokens - self.summary_tokens
+        if tokens > turn_budget:
+            turn = truncate_to_tokens(turn, turn_budget)
+            tokens = turn_budget
+        with self._lock:
+            self._turns.append((turn, tokens))
+            self._rendered = None
+            self._evict()
+            pending = bool(self._evicted)
+        if pending:
+            self._fold()
+
+    def reset(self):
+        with self._lock:
+            self.summary = ""
+            self.folded_turns = 0
+            self._turns = []
+            self._evicted = []
+            self._generation += 1
+            self._summary_tokens_used = 0
+            self._rendered = None
+
+    def render(self) -> str:
+        """The context as prompt text: summary first, then recent turns."""
+        with self._lock:
+            if self._rendered is None:
+                parts = []
+                if self.summary:
+                    parts.append(f"Summary of earlier conversation:\n{self.summary}")
+                if self._evicted or self._turns:
+                    parts.append("\n".join(text for text, _ in self._evicted + self._turns))
+                self._rendered = "\n\n".join(parts)
+            return self._rendered
+
+    @property
+    def tokens(self) -> int:
+        """Tokens currently used by the summary plus the verbatim turns."""
+        with self._lock:
+            return self._summary_tokens_used + sum(tokens for _, tokens in self._evicted + self._turns)
+
+    def __bool__(self):
+        return bool(self._turns or self._evicted or self.summary)
+
+    def __str__(self):
+        return self.render()
+
+    def _evict(self):
+        """Move the turns beyond the verbatim limits to ``_evicted`` (lock held)."""
+        turn_budget = self.budget_tokens - self.summary_tokens
+        used = sum(tokens for _, tokens in self._turns)
+        while len(self._turns) > 1 and (len(self._turns) > self.recent_turns or used > turn_budget):
+            turn = self._turns.pop(0)
+            self._evicted.append(turn)
+            used -= turn[1]
+
+    def _fold(self):
+        """Fold the evicted turns into the summary, calling the summarizer unlocked."""
+        with self._fold_lock:
+            with self._lock:
+                evicted = list(self._evicted)
+                summary = self.summary
+                generation = self._generation
+            if not evicted:
+                return  # folded by a concurrent add()
+            texts = [text for text, _ in evicted]
+            try:
+                summary = self.summarizer(summary, texts, self.summary_tokens)
+            except Exception:
+                summary = _extractive_summary(summary, texts, self.summary_tokens)
+            summary = truncate_to_tokens(summary, self.summary_tokens)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self.summary = summary
+                self._summary_tokens_used = count_tokens(summary)
+                # Turns evicted while the summarizer ran wait for the next fold
+                del self._evicted[:len(evicted)]
+                self.folded_turns += len(evicted)
+                self._rendered = None
+
+
+class RetryMemory:
+    """What execute_single_step tells the model about its failed attempts.
+
+    Each attempt's command and output are clipped to a head and a tail when
+    recorded, an output identical to an earlier attempt's is replaced by a
+    back-reference, and ``render()`` never exceeds ``budget_tokens``: the
+    newest attempts are shown in full, older ones as one line each, and the
+    oldest are dropped. The prompt for each retry is therefore bounded, and
+    the tokens sent over a chain of retries grow linearly.
+    """
+
+    def __init__(self, head_tokens=RETRY_OUTPUT_HEAD_TOKENS, tail_tokens=RETRY_OUTPUT_TAIL_TOKENS,
+                 budget_tokens=RETRY_HISTORY_TOKENS):
+        self.head_tokens = head_tokens
+        self.tail_tokens = tail_tokens
+        self.budget_tokens = budget_tokens
+        self._attempts = []  # (full text, tokens, one-line text, tokens)
+        self._seen_outputs = {}
+
+    def __len__(self):
+        return len(self._attempts)
+
+    def add(self, method, command, returncode, stdout, stderr):
+        """Record one failed attempt."""
+        number = len(self._attempts) + 1
+        command = clip_middle(command or "", self.head_tokens, self.tail_tokens)
+        output_key = (returncode, stdout, stderr)
+        first_seen = self._seen_outputs.setdefault(output_key, number)
+        if first_seen != number:
+            output = f"Output: identical to attempt {first_seen}"
+        else:
+            output = (
+                f"STDOUT:\n{clip_middle(stdout or '', self.head_tokens, self.tail_tokens)}\n"
+                f"STDERR:\n{clip_middle(stderr or '', self.head_tokens, self.tail_tokens)}"
+            )
+        full = (
+            f"Attempt {number}:\n"
+            f"Method: {method}\n"
+            f"Command/Code: {command}\n"
+            f"Return Code: {returncode}\n"
+            f"{output}"
+        )
+        first_line = command.strip().splitlines()[0][:80] if command.strip() else ""
+        line = f"Attempt {number}: {method} `{first_line}` -> return code {returncode}"
+        self._attempts.append((full, count_tokens(full), line, count_tokens(line)))
+
+    def render(self) -> str:
+        """The attempts as prompt text, within ``budget_tokens``."""
+        budget = self.budget_tokens
+        parts = []
+        full_allowed = True
+        for full, full_tokens, line, line_tokens in reversed(self._attempts):
+            if full_allowed and (full_tokens <= budget or not parts):
+                text, tokens = full, full_tokens
+            else:
+                full_allowed = False
+                text, tokens = line, line_tokens
+            if tokens > budget and parts:
+                parts.append(f"({len(self._attempts) - len(parts)} earlier attempts omitted)")
+                break
+            parts.append(text)
+            budget -= tokens
+        return "\n\n".join(reversed(parts))
+
+    def retry_prompt(self, prompt: str) -> str:
+        return (
+            "The previous command failed. Here is the history:\n\n"
+            + self.render()
+            + f"\n\nPlease suggest a corrected approach for:\n\"{prompt}\""
+        )
@@ -0,0 +1,557 @@
+"""
+Asyncio agent engine.
+
+Runs the plan -> approve -> execute loop of ``iterative_prompt_loop`` on
+asyncio: the model is called through the async OpenAI client, tools through
+an async keep-alive MCP client, and every human decision goes through an
+``Approver`` instead of ``input()``. One engine can drive many independent
+sessions at once; ``max_concurrency`` caps the model and tool calls in
+flight across all of them.
+"""
+import asyncio
+import sys
+
+from agent import next_calls_async, mcp_result, discover_available_tools, _get_command_display
+from config import MAX_RETRIES, MCP_STREAM_OUTPUT, AGENT_MAX_STEPS, AGENT_MAX_CONCURRENCY
+from context import ConversationContext, RetryMemory
+from mcp_client import AsyncMCPClient, endpoint_for_method, same_server_groups
+from safety import is_command_safe, is_python_safe
+from text_chunking import count_tokens
+import tracing
+
+STREAMING_METHODS = ("terminal.execute", "python.execute")
+
+STEP_GUIDELINES = """IMPORTANT GUIDELINES:
+🔍 Use web.search for:
+- Searching the web for information
+- Finding facts, news, or general information
+- Research tasks
+
+🐍 Use python.execute for:
+- Data analysis, text processing, summarization
+- File parsing (PDF, CSV, JSON, etc.)
+- Complex calculations or algorithms
+- AI/ML tasks, web scraping, API calls
+- When you need libraries like pandas, requests, PyPDF2, etc.
+
+🖥️ Use terminal.execute for:
+- File system operations (ls, find, mkdir, etc.)
+- System information (ps, df, etc.)
+- Installing packages or tools
+- Basic text operations with standard Unix tools
+- Web content retrieval using curl, wget, etc.
+
+🤖 Use ai.summarize for:
+- Summarizing text content
+- Analyzing job postings, articles, documents
+
+- When you need several things that do not depend on each other (e.g. `ls` and `df -h`), return them as separate calls in one response; they run in parallel
+- If the user has been skipping commands repeatedly, try a completely different approach
+- If the task seems complete, respond with: echo "TASK_COMPLETE: [summary]" (using terminal.execute)"""
+
+SUCCESS_INDICATORS = ["opened", "found", "located", "successfully", "completed", "done"]
+
+
+# ====================
+# APPROVERS
+# ====================
+class Approver:
+    """Human decisions the agent loop needs, as async callbacks.
+
+    The base class is the unattended policy: it runs nothing, never
+    confirms completion early and gives up after a skipped step.
+    """
+
+    async def approve(self, session, method: str, params: dict) -> bool:
+        """Whether to execute a proposed (already safety-checked) tool call."""
+        return False
+
+    async def confirm_complete(self, session, output: str) -> bool:
+        """Whether a successful step finishes the task."""
+        return False
+
+    async def after_skip(self, session):
+        """After a skipped step: ``("c", None)`` continue, ``("g", None)``
+        give up, or ``("h", guidance)`` continue with guidance."""
+        return "g", None
+
+
+class AutoApprover(Approver):
+    """Executes every call that passes the safety checks."""
+
+    async def approve(self, session, method, params):
+        return True
+
+
+class ConsoleApprover(Approver):
+    """Asks on the terminal, like the original CLI.
+
+    ``input()`` runs in a thread so other sessions keep going while one
+    waits, and prompts from concurrent sessions are asked one at a time.
+    """
+
+    def __init__(self):
+        self._lock = None
+
+    async def ask(self, prompt: str) -> str:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return (await asyncio.to_thread(input, prompt)).strip().lower()
+
+    async def approve(self, session, method, params):
+        return await self.ask(f"{session.prefix}Execute this? (y/n): ") == "y"
+
+    async def confirm_complete(self, session, output):
+        session.log(f"\n[AGENT] 🤔 This step was successful. Does this complete your task?")
+        return await self.ask(f"{session.prefix}[AGENT] Task complete? (y/n): ") == "y"
+
+    async def after_skip(self, session):
+        session.log(f"\n[AGENT] ⚠️ User has skipped command.")
+        choice = await self.ask(f"{session.prefix}[AGENT] Continue trying (c), give up (g), or provide guidance (h)? ")
+        if choice == "h":
+            return choice, await self.ask(f"{session.prefix}[AGENT] What would you like me to try instead? ")
+        return choice, None
+
+
+# ====================
+# SESSIONS
+# ====================
+class AgentSession:
+    """State and counters of one task run by the engine."""
+
+    def __init__(self, engine, task, context=None, name=None):
+        self.engine = engine
+        self.task = task
+        self.name = name
+        self.context = context if context is not None else ConversationContext()
+        self.steps = []
+        self.status = "pending"
+        self.llm_calls = 0
+        self.mcp_calls = 0
+        self.trace_id = None
+
+    @property
+    def prefix(self):
+        return f"[{self.name}] " if self.name else ""
+
+    def log(self, text):
+        self.engine.printer(self.prefix + text if self.prefix else text)
+
+    def live_output(self, stream, text):
+        """Echo streamed command output as it arrives."""
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def summary(self) -> dict:
+        return {
+            "task": self.task,
+            "status": self.status,
+            "steps": len(self.steps),
+            "llm_calls": self.llm_calls,
+            "mcp_calls": self.mcp_calls,
+            "trace_id": self.trace_id,
+        }
+
+
+# ====================
+# ENGINE
+# ====================
+class AgentEngine:
+    """Runs agent sessions concurrently on one event loop.
+
+    Use as ``async with AgentEngine(approver) as engine:`` so the MCP
+    connection pool is closed on exit. ``stream_output`` echoes command
+    output live, which only makes sense for a single interactive session.
+    """
+
+    def __init__(self, approver=None, max_concurrency=AGENT_MAX_CONCURRENCY, max_steps=AGENT_MAX_STEPS,
+                 stream_output=False, printer=print):
+        self.approver = approver or Approver()
+        self.max_concurrency = max_concurrency
+        self.max_steps = max_steps
+        self.stream_output = stream_output
+        self.printer = printer
+        self._semaphore = None
+        self._mcp = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._mcp is not None:
+            await self._mcp.aclose()
+            self._mcp = None
+
+    def _limit(self):
+        # Created lazily so the engine can be built outside the event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def call_llm(self, session, prompt: str) -> list:
+        """The model's next action, as a list of independent tool calls."""
+        async with self._limit():
+            session.llm_calls += 1
+            with tracing.span("llm"):
+                return await next_calls_async(prompt)
+
+    async def call_mcp(self, session, method: str, params: dict, stream=True) -> dict:
+        if self._mcp is None:
+            self._mcp = AsyncMCPClient()
+        endpoint = endpoint_for_method(method)
+        async with self._limit():
+            session.mcp_calls += 1
+            if stream and self.stream_output and method in STREAMING_METHODS:
+                response_json = await self._mcp.rpc_stream(endpoint, method, params, session.live_output)
+            else:
+                response_json = await self._mcp.rpc(endpoint, method, params)
+        return mcp_result(response_json)
+
+    async def call_mcp_batch(self, session, calls) -> list:
+        """Run ``(method, params)`` calls as one JSON-RPC batch per server;
+        results come back in the order of ``calls``."""
+        if self._mcp is None:
+            self._mcp = AsyncMCPClient()
+        by_endpoint = same_server_groups(method for method, _ in calls)
+
+        async def send(endpoint, indexes):
+            async with self._limit():
+                session.mcp_calls += len(indexes)
+                return await self._mcp.rpc_batch(endpoint, [calls[i] for i in indexes])
+
+        # One unreachable server fails only its own calls, not the whole step
+        batches = await asyncio.gather(*(send(endpoint, indexes) for endpoint, indexes in by_endpoint.items()),
+                                       return_exceptions=True)
+        results = [None] * len(calls)
+        for indexes, responses in zip(by_endpoint.values(), batches):
+            if isinstance(responses, BaseException):
+                if not isinstance(responses, Exception):
+                    raise responses
+                for index in indexes:
+                    results[index] = {"error": str(responses) or type(responses).__name__, "returncode": 1}
+                continue
+            for index, response in zip(indexes, responses):
+                results[index] = mcp_result(response)
+        return results
+
+    async def run_many(self, tasks, context_factory=None):
+        """Run independent tasks concurrently and return their sessions in order."""
+        sessions = [
+            AgentSession(self, task, context_factory() if context_factory else None, name=f"task-{i + 1}")
+            for i, task in enumerate(tasks)
+        ]
+        await asyncio.gather(*(self.run_session(session) for session in sessions))
+        return sessions
+
+    async def run_task(self, task: str, context=None, name=None):
+        """Run one task to completion and return its AgentSession."""
+        session = AgentSession(self, task, context, name)
+        await self.run_session(session)
+        return session
+
+    async def run_session(self, session):
+        # Each session is one trace; gather() gives every session its own context
+        with tracing.span("task", root=True, task=session.task[:200], session=session.name) as task_span:
+            session.trace_id = tracing.current_trace_id()
+            try:
+                await self._loop(session)
+            except Exception as e:
+                session.status = "error"
+                session.log(f"[ERROR] {e}")
+            task_span.set(status=session.status, steps=len(session.steps))
+        return session
+
+    def build_prompt(self, session, tools: dict) -> str:
+        context_parts = []
+        tool_list = "\n".join([f"- {name}: {info['description']}" for name, info in tools.items()])
+        context_parts.append(f"AVAILABLE TOOLS:\n{tool_list}")
+
+        if session.context:
+            context_parts.append(f"CONVERSATION HISTORY:\n{session.context.render()}")
+
+        if session.steps:
+            recent_steps = "\n".join([
+                f"Step {i+1}: {step['method']} -> {step['command'][:50]}... -> {'SUCCESS' if step['success'] else 'SKIPPED/FAILED'}\n"
+                f"Result: {step['output'][:200]}{'...' if len(step['output']) > 200 else ''}"
+                for i, step in enumerate(session.steps[-3:])
+            ])
+            context_parts.append(f"RECENT STEPS:\n{recent_steps}")
+
+        return f"""
+{chr(10).join(context_parts)}
+
+CURRENT TASK: "{session.task}"
+
+Based on ALL the context above, what should be the next action?
+
+{STEP_GUIDELINES}
+
+Provide the next appropriate action:
+"""
+
+    async def _loop(self, session):
+        session.status = "running"
+        session.log(f"\n[AGENT] Starting work on: {session.task}")
+        consecutive_skips = 0
+        step_count = 0
+
+        while step_count < self.max_steps:
+            step_count += 1
+            with tracing.span("step", step=step_count):
+                session.log(f"\n{'='*50}")
+                session.log(f"[AGENT] Step {step_count}")
+                session.log(f"{'='*50}")
+
+                tools = await asyncio.to_thread(discover_available_tools)
+                next_prompt = self.build_prompt(session, tools)
+                session.log(f"[AGENT] Prompt: {count_tokens(next_prompt)} tokens "
+                            f"(history {session.context.tokens}, {session.context.folded_turns} turns summarized)")
+
+                success, command_info = await self.execute_step(session, next_prompt)
+                output = command_info.get("output", "")
+                skipped = not success and "Skipped by user" in output
+                consecutive_skips = consecutive_skips + 1 if skipped else 0
+
+                session.steps.append({
+                    "method": command_info.get("method", ""),
+                    "command": command_info.get("command", "")[:100],  # Truncate long code
+                    "success": success,
+                    "output": output,
+                    "skipped": skipped
+                })
+
+                if "TASK_COMPLETE" in output:
+                    session.status = "completed"
+                    session.log(f"\n[AGENT] ✅ Task completed after {step_count} steps!")
+                    session.log(f"[AGENT] {output}")
+                    break
+
+                # A successful step that looks final may end the task
+                if success and output and any(indicator in output.lower() for indicator in SUCCESS_INDICATORS):
+                    with tracing.span("approval", kind="confirm_complete"):
+                        confirmed = await self.approver.confirm_complete(session, output)
+                    if confirmed:
+                        session.status = "completed"
+                        session.log(f"\n[AGENT] ✅ Task completed after {step_count} steps!")
+                        break
+
+                if consecutive_skips >= 1:
+                    with tracing.span("approval", kind="after_skip"):
+                        choice, guidance = await self.approver.after_skip(session)
+                    if choice == "g":
+                        session.status = "gave_up"
+                        session.log("[AGENT] Giving up on this task.")
+                        break
+                    elif choice == "h":
+                        if guidance:
+                            session.context.add("User guidance", guidance)
+                        consecutive_skips = 0
+                    elif choice == "c":
+                        consecutive_skips = 0
+                        session.log("[AGENT] Continuing with a different approach...")
+
+                session.log(f"[AGENT] Continuing to next step...")
+
+        if session.status == "running":
+            session.status = "max_steps"
+        if step_count >= self.max_steps and session.status == "max_steps":
+            session.log(f"\n[AGENT] ⚠️ Reached maximum steps ({self.max_steps}). Task may not be complete.")
+
+        session.log(f"\n[AGENT] Final summary:")
+        for i, step in enumerate(session.steps):
+            if step["skipped"]:
+                status = "⏭️"
+            elif step["success"]:
+                status = "✅"
+            else:
+                status = "❌"
+            method_icon = "🐍" if step["method"] == "python.execute" else "🖥️"
+            session.log(f"  Step {i+1}: {status} {method_icon} {step['command']}")
+
+    async def execute_step(self, session, prompt: str):
+        """One step with retries: ask the model, check, approve, execute.
+
+        The model may answer with several independent calls. Each is
+        checked and approved on its own, and the approved ones run
+        concurrently. The step succeeds if any of them succeeded and is
+        retried if all of them failed. Returns ``(success, info)`` like
+        agent.execute_single_step.
+        """
+        memory = RetryMemory()
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                retry_prompt = memory.retry_prompt(prompt) if memory else prompt
+                tool_calls = await self.call_llm(session, retry_prompt)
+                parallel = len(tool_calls) > 1
+
+                session.log(f"\n[STEP] Attempt {attempt}" + (f" ({len(tool_calls)} calls)" if parallel else ""))
+                outcomes = [None] * len(tool_calls)
+                runnable = []
+                for index, tool_call in enumerate(tool_calls):
+                    outcomes[index] = await self._check_and_approve(session, tool_call["method"], tool_call["params"])
+                    if outcomes[index] is None:
+                        runnable.append(index)
+
+                if len(runnable) == 1:
+                    call = tool_calls[runnable[0]]
+                    results = [await self.call_mcp(session, call["method"], call["params"], stream=not parallel)]
+                else:
+                    # One JSON-RPC batch per server; the servers run the calls concurrently
+                    results = await self.call_mcp_batch(
+                        session, [(tool_calls[i]["method"], tool_calls[i]["params"]) for i in runnable]
+                    )
+                for index, result in zip(runnable, results):
+                    method, params = tool_calls[index]["method"], tool_calls[index]["params"]
+                    succeeded = result.get("returncode", 1) == 0
+                    if succeeded:
+                        output = result.get("stdout", "").strip() or result.get("content", "").strip() or result.get("summary", "").strip()
+                    else:
+                        output = result.get("stderr", "").strip() or result.get("error", "")
+                    outcomes[index] = {
+                        "method": method,
+                        "command": _get_command_display(method, params),
+                        "output": output,
+                        "description": params.get("description", ""),
+                        "success": succeeded,
+                        "result": result,
+                    }
+
+                if not parallel:
+                    outcome = outcomes[0]
+                    if "result" not in outcome:
+                        return False, outcome  # blocked or skipped
+                    if outcome["success"]:
+                        self._log_output(session, outcome)
+                        outcome.pop("result")
+                        outcome.pop("success")
+                        return True, outcome
+                    session.log("[❌ STEP FAILURE]")
+                    session.log(outcome["result"].get("stderr", "").strip())
+                else:
+                    for outcome in outcomes:
+                        if "result" in outcome:
+                            self._log_output(session, outcome)
+                    if any(outcome.get("success") for outcome in outcomes):
+                        return True, self._combine(outcomes)
+                    if not runnable:
+                        return False, self._combine(outcomes)
+
+                for outcome in outcomes:
+                    if "result" in outcome and not outcome["success"]:
+                        result = outcome["result"]
+                        memory.add(
+                            outcome["method"],
+                            outcome["command"],
+                            result.get("returncode", 1),
+                            result.get("stdout", ""),
+                            result.get("stderr", "") or result.get("error", ""),
+                        )
+
+            except Exception as e:
+                session.log(f"[ERROR] {e}")
+                return False, {"method": "", "command": "", "output": f"Error: {e}"}
+
+        session.log("⚠️ Step failed after all retry attempts")
+        return False, {"method": "", "command": "", "output": "Failed after all retries"}
+
+    async def _check_and_approve(self, session, method, params):
+        """Show a proposed call and run the safety check and approval.
+
+        Returns None if the call may run, else the step info for a blocked
+        or skipped call.
+        """
+        if method == "python.execute":
+            session.log(f"[STEP] 🐍 Python Code:")
+            session.log(f"[STEP] Description: {params.get('description', 'No description')}")
+            # Show first few lines of code
+            code_lines = params['code'].strip().split('\n')
+            for i, line in enumerate(code_lines[:5]):
+                session.log(f"      {i+1}: {line}")
+            if len(code_lines) > 5:
+                session.log(f"      ... ({len(code_lines)-5} more lines)")
+
+            if not is_python_safe(params["code"]):
+                session.log("[BLOCKED] Python code contains dangerous operations")
+                return {"method": method, "command": params["code"], "output": "Code blocked for safety"}
+        elif method.startswith("ai."):
+            session.log(f"[STEP] 🤖 AI {method.split('.')[1].title()}:")
+            session.log(f"[STEP] Description: {params.get('description', 'No description')}")
+        else:
+            session.log(f"[STEP] 🖥️ Terminal Command: {params['command']}")
+            session.log(f"[STEP] Description: {params.get('description', 'No description')}")
+
+            if not is_command_safe(params["command"]):
+                session.log("[BLOCKED] Command contains dangerous keywords")
+                return {"method": method, "command": params["command"], "output": "Command blocked for safety"}
+
+        # TASK_COMPLETE commands are executed without asking
+        if method == "terminal.execute" and "TASK_COMPLETE" in params.get("command", ""):
+            session.log("Auto-executing TASK_COMPLETE command...")
+        else:
+            with tracing.span("approval", kind="approve", method=method):
+                approved = await self.approver.approve(session, method, params)
+            if not approved:
+                session.log("Execution skipped by user")
+                return {"method": method, "command": params.get("command", params.get("code", "")), "output": "Skipped by user"}
+        return None
+
+    @staticmethod
+    def _log_output(session, outcome):
+        if not outcome["success"]:
+            session.log(f"[❌ STEP FAILURE] {outcome['command'][:60]}")
+            session.log(outcome["output"])
+            return
+        session.log("[✅ STEP SUCCESS]")
+        output = outcome["output"]
+        session.log("[OUTPUT]")
+        for line in output.splitlines()[:10]:  # Show first 10 lines
+            session.log(f"  {line}")
+        if len(output.splitlines()) > 10:
+            session.log("  ...")
+
+    @staticmethod
+    def _combine(outcomes):
+        """Step info for a multi-call step, with every call's output."""
+        methods = []
+        for outcome in outcomes:
+            if outcome["method"] not in methods:
+                methods.append(outcome["method"])
+        sections = []
+        for outcome in outcomes:
+            if "result" not in outcome:
+                status = "SKIPPED/BLOCKED"
+            else:
+                status = "OK" if outcome["success"] else f"FAILED (return code {outcome['result'].get('returncode', 1)})"
+            sections.append(f"[{outcome['method']}] {outcome['command'][:80]} -> {status}\n{outcome['output']}")
+        return {
+            "method": ", ".join(methods),
+            "command": "; ".join(outcome["command"][:60] for outcome in outcomes),
+            "output": "\n\n".join(sections),
+            "description": "; ".join(outcome.get("description", "") for outcome in outcomes if outcome.get("description")),
+        }
+
+
+# ====================
+# SYNC ENTRY POINTS
+# ====================
+def run_console_task(task: str, context=None):
+    """Run one task interactively on the terminal; returns the AgentSession."""
+    async def run():
+        async with AgentEngine(ConsoleApprover(), stream_output=MCP_STREAM_OUTPUT) as engine:
+            return await engine.run_task(task, context)
+
+    return asyncio.run(run())
+
+
+def run_console_step(prompt: str):
+    """Run one step interactively on the terminal; returns ``(success, info)``."""
+    async def run():
+        async with AgentEngine(ConsoleApprover(), stream_output=MCP_STREAM_OUTPUT) as engine:
+            return await engine.execute_step(AgentSession(engine, prompt), prompt)
+
+    return asyncio.run(run())
@@ -0,0 +1,270 @@
+import codecs
+import os
+import selectors
+import signal
+import subprocess
+import tempfile
+import time
+
+from config import OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, OUTPUT_SPILL, OUTPUT_SPILL_DIR, EXECUTION_LIMITS
+from python_worker import apply_limits
+
+_READ_SIZE = 65536
+# After a timeout kill, keep draining pipes this long for the last output
+# (a daemonized grandchild may hold them open forever).
+_KILL_DRAIN_SECONDS = 2
+
+
+# ====================
+# LIMITS
+# ====================
+def limits_for(method, params=None):
+    """Effective limits for one call: the method's configured limits, with a
+    smaller per-call ``params["timeout"]`` honoured."""
+    limits = dict(EXECUTION_LIMITS.get(method, {}))
+    requested = (params or {}).get("timeout")
+    if isinstance(requested, (int, float)) and requested > 0:
+        configured = limits.get("timeout")
+        limits["timeout"] = requested if configured is None else min(requested, configured)
+    return limits
+
+
+def popen_kwargs():
+    """Popen arguments that start the run in its own process group."""
+    return {"start_new_session": True}
+
+
+def limit_process(proc, limits):
+    """Apply the rlimits in ``limits`` to a just-started Popen.
+
+    Set from outside with prlimit() rather than in a preexec_fn, which can
+    deadlock the child of a multithreaded server before exec. The run may
+    start before the limits land; the wall-clock timeout bounds it anyway.
+    """
+    rlimits = {k: v for k, v in (limits or {}).items() if k != "timeout" and v is not None}
+    if not rlimits or os.name != "posix":
+        return
+    try:
+        apply_limits(rlimits, pid=proc.pid)
+    except (ProcessLookupError, PermissionError):
+        pass  # already exited
+
+
+def _kill_group(proc):
+    if not isinstance(proc, subprocess.Popen):
+        proc.kill()  # ForkedProcess kills its own group
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+def _wait_with_rusage(proc, timeout=None):
+    """Wait for exit and return ``(returncode, rusage_dict_or_None)``.
+
+    Raises subprocess.TimeoutExpired if the process is still running after
+    ``timeout`` seconds (None waits forever).
+    """
+    if not isinstance(proc, subprocess.Popen):
+        # ForkedProcess: the pool worker reaps the child and reports rusage
+        return proc.wait(timeout), proc.rusage
+    if os.name != "posix":
+        return proc.wait(timeout), None
+    if timeout is None:
+        _pid, status, ru = os.wait4(proc.pid, 0)
+    else:
+        deadline = time.monotonic() + timeout
+        delay = 0.001
+        while True:
+            pid, status, ru = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(proc.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, {
+        "cpu_user": ru.ru_utime,
+        "cpu_system": ru.ru_stime,
+        "max_rss_kb": ru.ru_maxrss,
+    }
+
+
+def _exceeded_limit(limits, timed_out, returncode, rusage):
+    if timed_out:
+        return "timeout"
+    sigxcpu = getattr(signal, "SIGXCPU", None)
+    # A shell reports a child killed by a signal as exit status 128 + signo.
+    if sigxcpu and returncode in (-sigxcpu, 128 + sigxcpu):
+        return "cpu_seconds"
+    cpu_limit = limits.get("cpu_seconds")
+    if cpu_limit and rusage and rusage["cpu_user"] + rusage["cpu_system"] >= cpu_limit and returncode != 0:
+        return "cpu_seconds"
+    return None
+
+
+# ====================
+# OUTPUT CAPTURE
+# ====================
+class StreamCapture:
+    """Bounded capture of one output stream.
+
+    Keeps the first ``head_bytes`` and a ring buffer of the last
+    ``tail_bytes``; everything in between is only counted. When
+    ``spill_dir`` is given the full stream is also written to a file there.
+    """
+
+    def __init__(self, name, head_bytes=OUTPUT_HEAD_BYTES, tail_bytes=OUTPUT_TAIL_BYTES, spill_dir=None):
+        self.name = name
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.spill_path = None
+        self._spill = None
+        if spill_dir is not None:
+            fd, self.spill_path = tempfile.mkstemp(prefix=f"mcp-{name}-", suffix=".log", dir=spill_dir or None)
+            self._spill = os.fdopen(fd, "wb")
+
+    @property
+    def truncated(self):
+        return self.total_bytes > len(self.head) + len(self.tail)
+
+    def feed(self, data):
+        self.total_bytes += len(data)
+        if self._spill is not None:
+            self._spill.write(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data and self.tail_bytes > 0:
+            self.tail += data
+            if len(self.tail) > self.tail_bytes:
+                del self.tail[:-self.tail_bytes]
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def text(self):
+        """Decoded head and tail, with a marker where bytes were dropped."""
+        head = bytes(self.head).decode(errors="replace")
+        if not self.tail:
+            return head
+        tail = bytes(self.tail).decode(errors="replace")
+        skipped = self.total_bytes - len(self.head) - len(self.tail)
+        if skipped <= 0:
+            return bytes(self.head + self.tail).decode(errors="replace")
+        return f"{head}\n... [{skipped} bytes truncated] ...\n{tail}"
+
+
+# ====================
+# PROCESS RUNNER
+# ====================
+def run_process(proc, on_output=None, spill=None, limits=None):
+    """Drain ``proc.stdout``/``proc.stderr`` incrementally and wait for exit.
+
+    ``proc`` is a ``subprocess.Popen`` (started with popen_kwargs()) or a
+    ``python_pool.ForkedProcess`` opened with binary pipes. Memory stays
+    bounded by the capture caps no matter how much the process prints.
+    ``on_output(stream, text)`` is called with decoded chunks as they
+    arrive. After ``limits["timeout"]`` seconds the whole process group is
+    killed.
+
+    Returns a dict with the captured ``stdout``/``stderr`` text, byte
+    counts, ``returncode``, whether the run was ``killed``/``timed_out``,
+    which limit it hit (``limit_exceeded``) and the ``resources`` it used.
+    """
+    limits = limits or {}
+    timeout = limits.get("timeout")
+    if spill is None:
+        spill = OUTPUT_SPILL
+    spill_dir = (OUTPUT_SPILL_DIR or "") if spill else None
+    captures = {
+        proc.stdout: StreamCapture("stdout", spill_dir=spill_dir),
+        proc.stderr: StreamCapture("stderr", spill_dir=spill_dir),
+    }
+    decoders = {pipe: codecs.getincrementaldecoder("utf-8")(errors="replace") for pipe in captures}
+
+    started = time.monotonic()
+    deadline = started + timeout if timeout else None
+    timed_out = False
+    try:
+        with selectors.DefaultSelector() as sel:
+            for pipe in captures:
+                sel.register(pipe, selectors.EVENT_READ)
+            while sel.get_map():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    if timed_out:
+                        break
+                    timed_out = True
+                    _kill_group(proc)
+                    deadline = time.monotonic() + _KILL_DRAIN_SECONDS
+                    continue
+                for key, _ in sel.select(remaining):
+                    pipe = key.fileobj
+                    data = os.read(pipe.fileno(), _READ_SIZE)
+                    if not data:
+                        sel.unregister(pipe)
+                        if on_output is not None:
+                            rest = decoders[pipe].decode(b"", final=True)
+                            if rest:
+                                on_output(captures[pipe].name, rest)
+                        continue
+                    captures[pipe].feed(data)
+                    if on_output is not None:
+                        text = decoders[pipe].decode(data)
+                        if text:
+                            on_output(captures[pipe].name, text)
+    finally:
+        for pipe, capture in captures.items():
+            capture.close()
+            pipe.close()
+    # The pipes can reach EOF long before exit (the run closed or redirected
+    # its output), so the deadline still applies to the wait
+    try:
+        remaining = None if deadline is None or timed_out else max(0, deadline - time.monotonic())
+        returncode, rusage = _wait_with_rusage(proc, remaining)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_group(proc)
+        returncode, rusage = _wait_with_rusage(proc)
+
+    out, err = captures[proc.stdout], captures[proc.stderr]
+    resources = {"wall_time": round(time.monotonic() - started, 3)}
+    if rusage:
+        resources.update(rusage)
+    result = {
+        "stdout": out.text(),
+        "stderr": err.text(),
+        "returncode": returncode,
+        "stdout_bytes": out.total_bytes,
+        "stderr_bytes": err.total_bytes,
+        "truncated": out.truncated or err.truncated,
+        "killed": timed_out or returncode < 0,
+        "timed_out": timed_out,
+        "resources": resources,
+    }
+    if returncode < 0:
+        try:
+            result["signal"] = signal.Signals(-returncode).name
+        except ValueError:
+            result["signal"] = str(-returncode)
+
+    exceeded = _exceeded_limit(limits, timed_out, returncode, rusage)
+    if exceeded:
+        result["limit_exceeded"] = exceeded
+        result["killed"] = True
+    if timed_out:
+        result["stderr"] = (result["stderr"] + f"\n[Killed: exceeded {timeout}s time limit]").lstrip("\n")
+    if spill_dir is not None:
+        result["stdout_file"] = out.spill_path
+        result["stderr_file"] = err.spill_path
+    return result
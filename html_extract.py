@@ -0,0 +1,243 @@
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+
+from config import (
+    HTML_EXTRACT_MAX_CHARS, HTML_EXTRACT_MIN_BLOCK_CHARS, HTML_EXTRACT_FEED_CHARS, HTML_EXTRACT_WORKERS
+)
+
+# ====================
+# CONTENT HINTS
+# ====================
+# Elements whose text is never content
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "math", "iframe", "object", "canvas", "select"}
+
+# Elements that end a block of text when they open or close
+BLOCK_TAGS = {
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "dt", "dd", "blockquote", "pre",
+    "td", "th", "tr", "caption", "figcaption", "div", "section", "article", "main",
+    "header", "footer", "nav", "aside", "form", "ul", "ol", "dl", "table", "body", "title",
+}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+# Containers tracked on the open-element stack, with a base weight
+CONTAINER_WEIGHTS = {
+    "article": 2, "main": 2, "section": 0, "div": 0, "body": 0, "table": 0, "ul": 0, "ol": 0, "dl": 0,
+    "header": -1, "nav": -3, "footer": -3, "aside": -3, "form": -3, "menu": -3,
+}
+
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|page|post|story|text", re.IGNORECASE)
+NEGATIVE_HINTS = re.compile(
+    r"ad-|ads|banner|breadcrumb|comment|cookie|footer|masthead|menu|modal|nav|popup|promo|"
+    r"related|share|sidebar|social|sponsor|widget",
+    re.IGNORECASE,
+)
+
+
+def _container_weight(tag, attrs):
+    weight = CONTAINER_WEIGHTS[tag]
+    hints = " ".join(value for name, value in attrs if name in ("class", "id", "role") and value)
+    if hints:
+        if NEGATIVE_HINTS.search(hints):
+            weight -= 3
+        elif POSITIVE_HINTS.search(hints):
+            weight += 1
+    return weight
+
+
+# ====================
+# EXTRACTOR
+# ====================
+class HTMLTextExtractor(HTMLParser):
+    """Single-pass, incremental extraction of the readable text of a page.
+
+    Feed the document in pieces with ``feed()``. Text is collected per block
+    element (paragraph, heading, list item, cell...) and each block is
+    scored as it closes: blocks inside boilerplate containers (nav, footer,
+    sidebars, comments; by tag or class/id hints), link-heavy blocks and
+    short fragments are dropped. Kept blocks are returned in document order.
+    ``feed()`` returns True once ``max_chars`` of content has been kept, so
+    the caller can stop reading the rest of the page.
+    """
+
+    def __init__(self, max_chars=HTML_EXTRACT_MAX_CHARS, min_block_chars=HTML_EXTRACT_MIN_BLOCK_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.min_block_chars = min_block_chars
+        self.title = ""
+        self.blocks = []
+        self.kept_chars = 0
+        self.done = False
+        self._stack = []          # open containers: (tag, weight)
+        self._region = 0          # sum of the stack's weights
+        self._skip = 0            # depth inside SKIP_TAGS
+        self._links = 0           # depth inside <a>
+        self._text = []           # text of the current block
+        self._link_chars = 0
+        self._block_tag = None
+        self._in_title = False
+        self._fallback = []       # any visible text, if no block qualifies
+        self._fallback_chars = 0
+
+    # ---- public API ----
+    def feed(self, data):
+        if not self.done:
+            super().feed(data)
+        return self.done
+
+    def result(self) -> str:
+        """The extracted text; everything visible (first 2000 chars) if no block qualified."""
+        self._flush()
+        parts = ([self.title] if self.title else []) + self.blocks
+        if self.blocks:
+            return "\n\n".join(parts)[:self.max_chars]
+        fallback = " ".join(" ".join(self._fallback).split())[:2000]
+        return "\n\n".join(p for p in (self.title, fallback) if p)
+
+    # ---- tokenizer callbacks ----
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+            return
+        if self._skip:
+            return
+        if tag == "a":
+            self._links += 1
+        elif tag == "br":
+            self._text.append(" ")
+        elif tag == "title":
+            self._in_title = True
+        if tag in BLOCK_TAGS:
+            self._flush()
+            self._block_tag = tag
+        if tag in CONTAINER_WEIGHTS:
+            weight = _container_weight(tag, attrs)
+            self._stack.append((tag, weight))
+            self._region += weight
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == "br" and not self._skip:
+            self._text.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if self._skip:
+            return
+        if tag == "a":
+            self._links = max(0, self._links - 1)
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag == "title":
+            self._in_title = False
+        if tag in CONTAINER_WEIGHTS:
+            # Pop up to the matching element; stray end tags are ignored
+            for i in range(len(self._stack) - 1, -1, -1):
+                if self._stack[i][0] == tag:
+                    for _tag, weight in self._stack[i:]:
+                        self._region -= weight
+                    del self._stack[i:]
+                    break
+
+    def handle_data(self, data):
+        if self._skip or self.done:
+            return
+        if self._in_title:
+            self.title = " ".join((self.title + " " + data).split())
+            return
+        self._text.append(data)
+        if self._links:
+            self._link_chars += len(data.strip())
+        if self._fallback_chars < 2000:
+            self._fallback.append(data)
+            self._fallback_chars += len(data)
+
+    # ---- blocks ----
+    def _flush(self):
+        if not self._text:
+            return
+        text = " ".join("".join(self._text).split())
+        link_chars, tag = self._link_chars, self._block_tag
+        self._text, self._link_chars = [], 0
+        if not text or self.done or self._region < 0:
+            return
+        if tag in HEADING_TAGS:
+            keep = len(text) >= 3 and link_chars < len(text)
+        else:
+            keep = len(text) > self.min_block_chars and link_chars <= len(text) / 2
+        if keep:
+            self.blocks.append(text)
+            self.kept_chars += len(text) + 2
+            if self.kept_chars >= self.max_chars:
+                self.done = True
+
+
+def extract_text(html, max_chars=HTML_EXTRACT_MAX_CHARS) -> str:
+    """Readable text of an HTML document, at most ``max_chars`` long.
+
+    The document is fed in HTML_EXTRACT_FEED_CHARS slices and parsing stops
+    as soon as enough content has been collected.
+    """
+    return extract_from_chunks(
+        (html[i:i + HTML_EXTRACT_FEED_CHARS] for i in range(0, len(html), HTML_EXTRACT_FEED_CHARS)),
+        max_chars,
+    )
+
+
+def extract_from_chunks(chunks, max_chars=HTML_EXTRACT_MAX_CHARS) -> str:
+    """Like extract_text() for a document arriving as an iterable of str pieces."""
+    extractor = HTMLTextExtractor(max_chars)
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            break
+    if not extractor.done:
+        extractor.close()
+    return extractor.result()
+
+
+# ====================
+# EXTRACTION POOL
+# ====================
+# Worker processes for extract_text(), so parsing runs in parallel with the
+# downloads instead of competing with them for the GIL. They are spawned,
+# not forked: forking a multithreaded server is unsafe.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extract_pool():
+    """The shared extraction pool, or None when HTML_EXTRACT_WORKERS is 0."""
+    global _pool
+    if HTML_EXTRACT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=HTML_EXTRACT_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def close_extract_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def extract_text_pooled(html, max_chars=HTML_EXTRACT_MAX_CHARS) -> str:
+    """extract_text() in the extraction pool; in this thread if there is none or it broke."""
+    global _pool
+    pool = get_extract_pool()
+    if pool is not None:
+        try:
+            return pool.submit(extract_text, html, max_chars).result()
+        except BrokenProcessPool:
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None  # recreated on the next call
+    return extract_text(html, max_chars)
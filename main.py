@@ -1,14 +1,40 @@
 import threading
 import time
 
-from mcp_servers import start_terminal_mcp_server, start_python_mcp_server, start_ai_server
-from agent import iterative_prompt_loop
-from config import MCP_HOST, TERMINAL_MCP_PORT, PYTHON_MCP_PORT, AI_MCP_PORT
+from mcp_servers import (
+    start_terminal_mcp_server, start_python_mcp_server, start_ai_server, start_gateway_server, shutdown_servers
+)
+from context import ConversationContext
+from engine import run_console_task
+from config import MCP_HOST, MCP_LAYOUT, MCP_GATEWAY_PORT, TERMINAL_MCP_PORT, PYTHON_MCP_PORT, AI_MCP_PORT
+
+def _describe_outcome(user_input, steps):
+    """One-line record of a finished task for the conversation history."""
+    if not steps:
+        return f"[Task attempted: {user_input}]"
+    last = steps[-1]
+    status = "succeeded" if last["success"] else "skipped" if last["skipped"] else "failed"
+    output = last["output"].strip().replace("\n", " ")
+    if len(output) > 200:
+        output = output[:200] + "..."
+    return (f"[Task attempted: {user_input}] {len(steps)} step(s); last {last['method']} "
+            f"{status}: {output}")
+
+def start_servers():
+    """Start the MCP servers in daemon threads.
+
+    With MCP_LAYOUT = "gateway" one server on MCP_GATEWAY_PORT serves every
+    method; with "ports" each server gets its own port as before.
+    """
+    if MCP_LAYOUT == "gateway":
+        threading.Thread(
+            target=start_gateway_server,
+            args=(MCP_HOST, MCP_GATEWAY_PORT),
+            daemon=True
+        ).start()
+        time.sleep(2)  # Give the server time to start
+        return
 
-def main():
-    """Main entry point for the InnerLink AI Agent."""
-    
-    # Start all MCP servers
     terminal_thread = threading.Thread(
         target=start_terminal_mcp_server, 
         args=(MCP_HOST, TERMINAL_MCP_PORT), 
@@ -31,8 +57,13 @@ def main():
     
     time.sleep(2)  # Give servers time to start
 
+def main():
+    """Main entry point for the InnerLink AI Agent."""
+    
+    # Start all MCP servers
+    start_servers()
 
-    full_conversation = ""
+    conversation = ConversationContext()
 
     while True:
         print("\n\n[AGENT] Tell me what to do. I can execute terminal commands, Python code, and AI operations")
@@ -41,15 +72,16 @@ def main():
         user_input = input(">")
         if user_input.lower() in {"exit", "quit", "e"}:
             print("Goodbye!")
+            shutdown_servers()
             break
         if user_input.lower() in {""}:
             continue
         if user_input.lower() =='n':
-            full_conversation=""
+            conversation.reset()
             continue
-        full_conversation += f"\nUser: {user_input}"
-        iterative_prompt_loop(user_input, full_conversation)
-        full_conversation += f"\n[Task attempted: {user_input}]"
+        conversation.add("User", user_input)
+        session = run_console_task(user_input, conversation)
+        conversation.add("Agent", _describe_outcome(user_input, session.steps))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
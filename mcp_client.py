@@ -0,0 +1,249 @@
+import asyncio
+import json
+import threading
+
+import requests
+from openai import DEFAULT_CONNECTION_LIMITS, DefaultAsyncHttpxClient, Timeout
+from requests.adapters import HTTPAdapter
+
+import tracing
+from config import (
+    MCP_ENDPOINTS, MCP_POOL_SIZES, MCP_DEFAULT_POOL_SIZE, MCP_GATEWAY_POOL_SIZE,
+    MCP_TIMEOUTS, MCP_DEFAULT_TIMEOUT
+)
+
+# ====================
+# POOLED MCP CLIENT
+# ====================
+# One shared session with a keep-alive connection pool mounted per endpoint,
+# so repeated JSON-RPC calls reuse TCP connections instead of reconnecting.
+_session = None
+_session_lock = threading.Lock()
+
+
+def same_server_groups(methods) -> dict:
+    """Group method indexes by the server that serves them.
+
+    Returns ``{endpoint: [index, ...]}`` with one representative endpoint per
+    server URL, so a caller can send one batch per server.
+    """
+    groups = {}
+    representative = {}
+    for index, method in enumerate(methods):
+        endpoint = endpoint_for_method(method)
+        endpoint = representative.setdefault(MCP_ENDPOINTS[endpoint], endpoint)
+        groups.setdefault(endpoint, []).append(index)
+    return groups
+
+
+def endpoint_for_method(method: str) -> str:
+    """Return the endpoint name that serves a JSON-RPC method."""
+    prefix = method.split(".", 1)[0]
+    if prefix in MCP_ENDPOINTS:
+        return prefix
+    return "terminal"
+
+
+def server_pool_sizes() -> dict:
+    """Connection pool size per server URL.
+
+    Endpoints that share a server (the gateway layout) share one pool of
+    MCP_GATEWAY_POOL_SIZE connections.
+    """
+    endpoints_by_url = {}
+    for endpoint, url in MCP_ENDPOINTS.items():
+        endpoints_by_url.setdefault(url.rstrip("/") + "/", []).append(endpoint)
+    return {
+        url: MCP_GATEWAY_POOL_SIZE if len(endpoints) > 1
+        else MCP_POOL_SIZES.get(endpoints[0], MCP_DEFAULT_POOL_SIZE)
+        for url, endpoints in endpoints_by_url.items()
+    }
+
+
+def get_session() -> requests.Session:
+    """Return the shared pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                for url, size in server_pool_sizes().items():
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                    session.mount(url, adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    """Close all pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _request(method, params, request_id):
+    """A JSON-RPC request object carrying the current trace context."""
+    request = {"jsonrpc": "2.0", "method": method, "id": request_id}
+    params = tracing.inject(params)
+    if params is not None:
+        request["params"] = params
+    return request
+
+
+def rpc(endpoint: str, method: str, params=None, request_id=1, timeout=None) -> dict:
+    """Send one JSON-RPC request to an MCP endpoint and return the decoded response."""
+    url = MCP_ENDPOINTS[endpoint]
+    if timeout is None:
+        timeout = MCP_TIMEOUTS.get(endpoint, MCP_DEFAULT_TIMEOUT)
+    with tracing.span("mcp.request", method=method, endpoint=endpoint):
+        payload = _request(method, params, request_id)
+        res = get_session().post(url.rstrip("/") + "/", json=payload, timeout=timeout)
+        return res.json()
+
+
+def _batch_payload(calls):
+    return [_request(method, params, request_id) for request_id, (method, params) in enumerate(calls, 1)]
+
+
+def _match_batch(calls, responses):
+    """Order batch responses like ``calls``; missing ones become errors."""
+    if isinstance(responses, dict):
+        # The whole batch was rejected (e.g. too large); fail every call alike
+        return [dict(responses, id=i) for i in range(1, len(calls) + 1)]
+    by_id = {response.get("id"): response for response in responses}
+    return [
+        by_id.get(request_id) or {"jsonrpc": "2.0", "id": request_id,
+                                  "error": {"code": -32603, "message": "No response for batch item"}}
+        for request_id in range(1, len(calls) + 1)
+    ]
+
+
+def rpc_batch(endpoint: str, calls, timeout=None) -> list:
+    """Send ``calls`` (a list of ``(method, params)``) as one JSON-RPC batch.
+
+    The server runs the calls concurrently; the responses are returned in
+    the order of ``calls``.
+    """
+    if not calls:
+        return []
+    url = MCP_ENDPOINTS[endpoint]
+    if timeout is None:
+        timeout = MCP_TIMEOUTS.get(endpoint, MCP_DEFAULT_TIMEOUT)
+    with tracing.span("mcp.batch", methods=[method for method, _ in calls], endpoint=endpoint):
+        res = get_session().post(url.rstrip("/") + "/", json=_batch_payload(calls), timeout=timeout)
+        return _match_batch(calls, res.json())
+
+
+def rpc_stream(endpoint: str, method: str, params, on_output, request_id=1, timeout=None) -> dict:
+    """Like rpc(), but ask the server to stream output while the call runs.
+
+    ``on_output(stream, text)`` receives each ``notifications/output`` chunk
+    as it arrives; the final JSON-RPC response is returned. Servers that do
+    not stream the method just answer with a plain response.
+    """
+    url = MCP_ENDPOINTS[endpoint]
+    if timeout is None:
+        timeout = MCP_TIMEOUTS.get(endpoint, MCP_DEFAULT_TIMEOUT)
+    with tracing.span("mcp.request", method=method, endpoint=endpoint, stream=True):
+        payload = _request(method, dict(params, stream=True), request_id)
+        with get_session().post(url.rstrip("/") + "/", json=payload, timeout=timeout, stream=True) as res:
+            if not res.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+                return res.json()
+            response = None
+            for line in res.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                message = json.loads(line)
+                if message.get("method") == "notifications/output":
+                    on_output(message["params"]["stream"], message["params"]["data"])
+                else:
+                    response = message
+            if response is None:
+                raise ValueError("Stream ended without a JSON-RPC response")
+            return response
+
+
+# ====================
+# ASYNC MCP CLIENT
+# ====================
+class AsyncMCPClient:
+    """asyncio counterpart of rpc()/rpc_stream() for the agent engine.
+
+    Holds one DefaultAsyncHttpxClient, the async HTTP client openai itself
+    is built on, so it needs nothing openai does not already install.
+    Requests per server are capped at the size of the sync pool (see
+    server_pool_sizes()), so the client never holds more keep-alive
+    connections than a server has workers for.
+    Create it inside the running event loop and ``aclose()`` it when done
+    (or use ``async with``).
+    """
+
+    def __init__(self):
+        sizes = server_pool_sizes()
+        self._slots = {url: asyncio.Semaphore(size) for url, size in sizes.items()}
+        total = sum(sizes.values())
+        limits = type(DEFAULT_CONNECTION_LIMITS)(max_connections=total, max_keepalive_connections=total)
+        self._client = DefaultAsyncHttpxClient(limits=limits)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _slot(self, endpoint):
+        return self._slots[MCP_ENDPOINTS[endpoint].rstrip("/") + "/"]
+
+    @staticmethod
+    def _timeout(endpoint, timeout):
+        if timeout is None:
+            timeout = MCP_TIMEOUTS.get(endpoint, MCP_DEFAULT_TIMEOUT)
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return Timeout(read, connect=connect)
+        return Timeout(timeout)
+
+    async def rpc(self, endpoint: str, method: str, params=None, request_id=1, timeout=None) -> dict:
+        """Send one JSON-RPC request and return the decoded response."""
+        with tracing.span("mcp.request", method=method, endpoint=endpoint):
+            payload = _request(method, params, request_id)
+            async with self._slot(endpoint):
+                res = await self._client.post(MCP_ENDPOINTS[endpoint].rstrip("/") + "/", json=payload,
+                                              timeout=self._timeout(endpoint, timeout))
+            return res.json()
+
+    async def rpc_batch(self, endpoint: str, calls, timeout=None) -> list:
+        """Like rpc_batch(): one round trip, responses in the order of ``calls``."""
+        if not calls:
+            return []
+        with tracing.span("mcp.batch", methods=[method for method, _ in calls], endpoint=endpoint):
+            async with self._slot(endpoint):
+                res = await self._client.post(MCP_ENDPOINTS[endpoint].rstrip("/") + "/", json=_batch_payload(calls),
+                                              timeout=self._timeout(endpoint, timeout))
+            return _match_batch(calls, res.json())
+
+    async def rpc_stream(self, endpoint: str, method: str, params, on_output, request_id=1, timeout=None) -> dict:
+        """Like rpc_stream(); ``on_output(stream, text)`` is a plain callable."""
+        with tracing.span("mcp.request", method=method, endpoint=endpoint, stream=True):
+            payload = _request(method, dict(params, stream=True), request_id)
+            async with self._slot(endpoint), self._client.stream("POST", MCP_ENDPOINTS[endpoint].rstrip("/") + "/", json=payload,
+                                           timeout=self._timeout(endpoint, timeout)) as res:
+                if not res.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+                    return json.loads(await res.aread())
+                response = None
+                async for line in res.aiter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if message.get("method") == "notifications/output":
+                        on_output(message["params"]["stream"], message["params"]["data"])
+                    else:
+                        response = message
+                if response is None:
+                    raise ValueError("Stream ended without a JSON-RPC response")
+                return response
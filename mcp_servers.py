@@ -1,100 +1,412 @@
+import hashlib
 import json
 import subprocess
 import os
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from safety import is_command_safe, is_python_safe
+from safety import command_verdict, is_python_safe
+from python_pool import get_pool
+from executors import run_process, limits_for, popen_kwargs, limit_process
+from cache import DiskCache, ResultCache, content_key
+from config import (
+    client, MCP_SERVER_WORKERS, MCP_SERVER_QUEUE_SIZE, MCP_KEEPALIVE_TIMEOUT,
+    MCP_BATCH_WORKERS, MCP_BATCH_MAX_ITEMS,
+    AI_MCP_MODEL, AI_CACHED_METHODS, AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL, AI_CACHE_DIR, AI_CACHE_MAX_BYTES,
+    AI_BATCH_CONCURRENCY, AI_BATCH_MAX_CONCURRENCY, AI_BATCH_MAX_ITEMS,
+    AI_SINGLE_CALL_TOKENS, AI_MAX_INPUT_TOKENS, AI_CHUNK_TOKENS, AI_CHUNK_OVERLAP_TOKENS,
+    AI_MAP_CONCURRENCY, AI_MAP_MAX_TOKENS, AI_MAX_REDUCE_ROUNDS,
+    WEB_FETCH_TIMEOUT, WEB_FETCH_MANY_CONCURRENCY, WEB_FETCH_MANY_MAX_CONCURRENCY, WEB_FETCH_MANY_MAX_URLS
+)
+from text_chunking import count_tokens, split_into_chunks, truncate_to_tokens
+from web_cache import get_http_cache, session_for
+from html_extract import extract_text, extract_text_pooled, close_extract_pool
+import metrics
+import tracing
 import json
-import requests
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from urllib.parse import quote_plus
-import re
 
 from openai import OpenAI
 import os
 
 
 # ====================
-# TERMINAL MCP SERVER
+# SERVING CORE
 # ====================
-class TerminalMCPHandler(BaseHTTPRequestHandler):
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that processes requests on a bounded worker pool.
+
+    At most ``max_workers`` requests run at once and up to ``max_queue`` more
+    wait for a worker. Anything beyond that is rejected immediately with a
+    JSON-RPC "server busy" error so one slow handler cannot stall the server.
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, max_workers=None, max_queue=None):
+        self.max_workers = max_workers or MCP_SERVER_WORKERS
+        self.max_queue = MCP_SERVER_QUEUE_SIZE if max_queue is None else max_queue
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=handler_class.__name__,
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self.metrics_label = handler_class.metrics_label
+        self._batch_pool = None
+        self._batch_pool_lock = threading.Lock()
+        super().__init__(server_address, handler_class)
+
+    def batch_pool(self):
+        """Executor shared by all JSON-RPC batches on this server."""
+        if self._batch_pool is None:
+            with self._batch_pool_lock:
+                if self._batch_pool is None:
+                    self._batch_pool = ThreadPoolExecutor(
+                        max_workers=MCP_BATCH_WORKERS,
+                        thread_name_prefix=f"{self.RequestHandlerClass.__name__}-batch",
+                    )
+        return self._batch_pool
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            metrics.REJECTED.inc(server=self.metrics_label)
+            self.reject_request(request)
+            self.shutdown_request(request)
+            return
+        metrics.CONNECTIONS.inc(server=self.metrics_label)
+        try:
+            self._pool.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # Pool is shutting down; drop the connection.
+            metrics.CONNECTIONS.dec(server=self.metrics_label)
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            metrics.CONNECTIONS.dec(server=self.metrics_label)
+            self._slots.release()
+
+    def reject_request(self, request):
+        """Answer an over-capacity connection with a JSON-RPC busy error."""
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "error": {"code": -32000, "message": "Server busy, try again later"},
+            "id": None
+        }).encode()
+        head = (
+            "HTTP/1.0 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Retry-After: 1\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        try:
+            request.sendall(head + body)
+        except OSError:
+            pass
+
+    def server_close(self):
+        """Stop listening, then wait for in-flight and queued requests to finish."""
+        super().server_close()
+        self._pool.shutdown(wait=True)
+        if self._batch_pool is not None:
+            self._batch_pool.shutdown(wait=True)
+
+
+_running_servers = []
+_running_servers_lock = threading.Lock()
+
+
+def serve(handler_class, host, port, label, max_workers=None, max_queue=None):
+    """Run an MCP handler on a pooled server until shutdown_servers() is called."""
+    server = PooledHTTPServer((host, port), handler_class, max_workers, max_queue)
+    with _running_servers_lock:
+        _running_servers.append(server)
+    print(f"[{label}] Running at http://{host}:{port}")
+    try:
+        metrics.start_server(host)
+    except OSError as e:
+        print(f"[{label}] Metrics endpoint unavailable: {e}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with _running_servers_lock:
+            if server in _running_servers:
+                _running_servers.remove(server)
+
+
+def shutdown_servers():
+    """Gracefully stop every server started with serve().
+
+    New connections stop being accepted, then each server drains the
+    requests it has already taken before its serve() call returns.
+    """
+    with _running_servers_lock:
+        servers = list(_running_servers)
+    for server in servers:
+        server.shutdown()
+    metrics.stop_server()
+
+
+class MCPRequestHandler(BaseHTTPRequestHandler):
+    """Shared HTTP plumbing for the MCP handlers.
+
+    Speaks HTTP/1.1 so clients can keep connections alive between JSON-RPC
+    calls. Idle connections are closed after MCP_KEEPALIVE_TIMEOUT seconds
+    so they do not pin a pool worker forever.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = MCP_KEEPALIVE_TIMEOUT
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK (~40 ms) on a kept-alive connection.
+    disable_nagle_algorithm = True
+    # "server" label of this handler's metrics
+    metrics_label = "mcp"
+    # Tool schemas returned by tools/list
+    tools = []
+    # JSON-RPC method name -> name of the handler method called with its params
+    rpc_methods = {}
+    # Methods whose output can be streamed while they run (params["stream"])
+    streaming_methods = ()
+    _stream_id = None
+
     def log_message(self, format, *args):
         # Suppress access logs
         pass
-        
+
     def do_POST(self):
         content_length = int(self.headers.get('Content-Length', 0))
         body = self.rfile.read(content_length)
-        response = self.handle_json_rpc(body)
+        request = self._streaming_request(body)
+        if request is not None:
+            self._stream_response(request, body)
+            return
+        response = self.handle_json_rpc(body).encode()
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
         self.end_headers()
-        self.wfile.write(response.encode())
+        self.wfile.write(response)
 
     def handle_json_rpc(self, body):
+        """Decode a JSON-RPC request or batch and return the encoded response.
+
+        Batch items run concurrently on the server's batch pool (at most
+        MCP_BATCH_WORKERS at a time per server) and the responses come back
+        in request order. Notifications (items without an ``id``) get no
+        response, so an all-notification batch returns an empty body.
+        """
         try:
             request = json.loads(body)
-            method = request.get("method")
-            params = request.get("params", {})
-            request_id = request.get("id")
-
-            if method == "tools/list":
-                # Return list of available terminal tools
-                tools = [
-                    {
-                        "name": "terminal.execute",
-                        "description": "Execute terminal commands",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "command": {"type": "string", "description": "Terminal command to execute"},
-                                "description": {"type": "string", "description": "Description of what the command does"}
-                            },
-                            "required": ["command"]
-                        }
-                    }
-                ]
-                return json.dumps({"jsonrpc": "2.0", "result": {"tools": tools}, "id": request_id})
-
-            elif method == "terminal.execute":
-                command = params.get("command")
-                result = self.execute_command(command)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            else:
-                return json.dumps({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": "Method not found"},
-                    "id": request_id
-                })
+        except ValueError:
+            return json.dumps(self.error_response(None, -32700, "Parse error"))
+        if isinstance(request, list):
+            responses = self.handle_batch(request)
+            return json.dumps(responses) if responses else ""
+        if not isinstance(request, dict):
+            return json.dumps(self.error_response(None, -32600, "Invalid Request"))
+        return json.dumps(self.handle_request(request))
+
+    def handle_request(self, request):
+        """Handle one decoded JSON-RPC request object and return the response dict.
 
+        ``tools/list`` answers with ``tools``; every other method is looked
+        up in ``rpc_methods`` and called with its params. Count, latency
+        and outcome go to the server's metrics.
+        """
+        method = request.get("method")
+        # Unknown method names share one label so clients cannot grow the series
+        known = isinstance(method, str) and (method in self.rpc_methods or method == "tools/list")
+        label = method if known else "unknown"
+        metrics.IN_FLIGHT.inc(server=self.metrics_label)
+        started = time.perf_counter()
+        try:
+            response = self._dispatch(request, method)
+        finally:
+            metrics.IN_FLIGHT.dec(server=self.metrics_label)
+        metrics.observe_request(self.metrics_label, label, time.perf_counter() - started, response)
+        return response
+
+    def _dispatch(self, request, method):
+        request_id = request.get("id")
+        try:
+            # A trace context in params._meta makes this request a span of the caller's trace
+            params, remote = tracing.extract(request.get("params") or {})
+            with tracing.span("mcp.server", parent=remote, method=method):
+                if method == "tools/list":
+                    return {"jsonrpc": "2.0", "result": self.tools_list_result(self.tools, params), "id": request_id}
+                handler = self.rpc_methods.get(method)
+                if handler is None:
+                    return self.error_response(request_id, -32601, "Method not found")
+                return {"jsonrpc": "2.0", "result": getattr(self, handler)(params), "id": request_id}
         except Exception as e:
-            return json.dumps({
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": str(e)},
-                "id": None
-            })
-
-    def execute_command(self, command):
-        if not is_command_safe(command):
+            return self.error_response(request_id, -32603, str(e))
+
+    def handle_batch(self, requests):
+        if not requests:
+            return self.error_response(None, -32600, "Invalid Request: empty batch")
+        if len(requests) > MCP_BATCH_MAX_ITEMS:
+            return self.error_response(None, -32600, f"Batch too large: {len(requests)} requests (max {MCP_BATCH_MAX_ITEMS})")
+
+        def run_item(request):
+            if not isinstance(request, dict):
+                return self.error_response(None, -32600, "Invalid Request")
+            try:
+                return self.handle_request(request)
+            except Exception as e:
+                return self.error_response(request.get("id"), -32603, str(e))
+
+        responses = list(self.server.batch_pool().map(run_item, requests))
+        return [response for request, response in zip(requests, responses)
+                if not (isinstance(request, dict) and "id" not in request)]
+
+    @staticmethod
+    def error_response(request_id, code, message):
+        return {"jsonrpc": "2.0", "error": {"code": code, "message": message}, "id": request_id}
+
+    # ====================
+    # STREAMED RESPONSES
+    # ====================
+    # A streamed call is answered with a chunked application/x-ndjson body:
+    # one "notifications/output" line per output chunk, then the normal
+    # JSON-RPC response as the last line.
+
+    def _streaming_request(self, body):
+        if b'"stream"' not in body:
+            return None
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return None
+        if (isinstance(request, dict)
+                and request.get("method") in self.streaming_methods
+                and (request.get("params") or {}).get("stream")):
+            return request
+        return None
+
+    def _stream_response(self, request, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._stream_id = request.get("id")
+        self._stream_broken = False
+        try:
+            response = self.handle_json_rpc(body)
+        finally:
+            self._stream_id = None
+        self._write_chunk((response + "\n").encode())
+        self._write_chunk(b"")
+        if self._stream_broken:
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        if self._stream_broken:
+            return
+        try:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        except OSError:
+            # Client went away; let the call finish without streaming.
+            self._stream_broken = True
+
+    def _send_output_chunk(self, stream, text):
+        line = json.dumps({
+            "jsonrpc": "2.0",
+            "method": "notifications/output",
+            "params": {"id": self._stream_id, "stream": stream, "data": text}
+        })
+        self._write_chunk((line + "\n").encode())
+
+    def output_callback(self):
+        """Callback for executors to stream output, or None if not streaming."""
+        if self._stream_id is None:
+            return None
+        return self._send_output_chunk
+
+    def tools_list_result(self, tools, params):
+        """Build a tools/list result tagged with an etag of the tool set.
+
+        Clients that already hold the current etag (``params["etag"]``) get a
+        short ``notModified`` reply instead of the full tool list.
+        """
+        etag = hashlib.sha1(json.dumps(tools, sort_keys=True).encode()).hexdigest()[:16]
+        if (params or {}).get("etag") == etag:
+            return {"etag": etag, "notModified": True}
+        return {"tools": tools, "etag": etag}
+
+
+# ====================
+# TERMINAL MCP SERVER
+# ====================
+class TerminalMCPHandler(MCPRequestHandler):
+    metrics_label = "terminal"
+    streaming_methods = ("terminal.execute",)
+
+    tools = [
+        {
+            "name": "terminal.execute",
+            "description": "Execute terminal commands",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "command": {"type": "string", "description": "Terminal command to execute"},
+                    "description": {"type": "string", "description": "Description of what the command does"},
+                    "timeout": {"type": "number", "description": "Wall-clock limit in seconds (capped by server config)"}
+                },
+                "required": ["command"]
+            }
+        }
+    ]
+    rpc_methods = {
+        "terminal.execute": "rpc_terminal_execute",
+    }
+
+    def rpc_terminal_execute(self, params):
+        return self.execute_command(params.get("command"), on_output=self.output_callback(),
+                                    spill=params.get("spill"),
+                                    limits=limits_for("terminal.execute", params))
+
+    def execute_command(self, command, on_output=None, spill=None, limits=None):
+        safe, reason = command_verdict(command)
+        if not safe:
             return {
                 "stdout": "",
-                "stderr": "Blocked for safety: command contains potentially dangerous keywords.",
+                "stderr": f"Blocked for safety: command {reason}.",
                 "returncode": 1
             }
 
         try:
             command = command.replace("~", os.path.expanduser("~"))
-            completed = subprocess.run(command, shell=True, text=True, capture_output=True)
+            if limits is None:
+                limits = limits_for("terminal.execute")
+            with tracing.span("subprocess.spawn"):
+                proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        **popen_kwargs())
+                limit_process(proc, limits)
+            with tracing.span("subprocess.run", pid=proc.pid) as run_span:
+                captured = run_process(proc, on_output=on_output, spill=spill, limits=limits)
+                run_span.set(returncode=captured["returncode"])
+            metrics.observe_subprocess("terminal.execute", captured)
 
-            stdout = completed.stdout.strip()
-            stderr = completed.stderr.strip()
-            returncode = completed.returncode
+            stdout = captured.pop("stdout").strip()
+            stderr = captured.pop("stderr").strip()
 
             response = {
                 "stdout": stdout if stdout else "<EMPTY STDOUT>",
                 "stderr": stderr if stderr else "<EMPTY STDERR>",
-                "returncode": returncode,
+                **captured,
             }
             if not stdout and not stderr:
                 response["stderr"] = (
@@ -107,64 +419,35 @@ class TerminalMCPHandler(BaseHTTPRequestHandler):
 # ====================
 # PYTHON MCP SERVER
 # ====================
-class PythonMCPHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        # Suppress access logs
-        pass
-        
-    def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
-        response = self.handle_json_rpc(body)
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(response.encode())
+class PythonMCPHandler(MCPRequestHandler):
+    metrics_label = "python"
+    streaming_methods = ("python.execute",)
 
-    def handle_json_rpc(self, body):
-        try:
-            request = json.loads(body)
-            method = request.get("method")
-            params = request.get("params", {})
-            request_id = request.get("id")
-
-            if method == "tools/list":
-                # Return list of available Python tools
-                tools = [
-                    {
-                        "name": "python.execute",
-                        "description": "Execute Python code",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "code": {"type": "string", "description": "Python code to execute"},
-                                "description": {"type": "string", "description": "Description of what the code does"}
-                            },
-                            "required": ["code"]
-                        }
-                    }
-                ]
-                return json.dumps({"jsonrpc": "2.0", "result": {"tools": tools}, "id": request_id})
-
-            elif method == "python.execute":
-                code = params.get("code")
-                result = self.execute_python(code)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            else:
-                return json.dumps({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": "Method not found"},
-                    "id": request_id
-                })
+    tools = [
+        {
+            "name": "python.execute",
+            "description": "Execute Python code",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "code": {"type": "string", "description": "Python code to execute"},
+                    "description": {"type": "string", "description": "Description of what the code does"},
+                    "timeout": {"type": "number", "description": "Wall-clock limit in seconds (capped by server config)"}
+                },
+                "required": ["code"]
+            }
+        }
+    ]
+    rpc_methods = {
+        "python.execute": "rpc_python_execute",
+    }
 
-        except Exception as e:
-            return json.dumps({
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": str(e)},
-                "id": None
-            })
+    def rpc_python_execute(self, params):
+        return self.execute_python(params.get("code"), on_output=self.output_callback(),
+                                   spill=params.get("spill"),
+                                   limits=limits_for("python.execute", params))
 
-    def execute_python(self, code):
+    def execute_python(self, code, on_output=None, spill=None, limits=None):
         if not is_python_safe(code):
             return {
                 "stdout": "",
@@ -173,26 +456,44 @@ class PythonMCPHandler(BaseHTTPRequestHandler):
             }
 
         try:
-            # Create a temporary file for the Python code
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-
-            # Execute the Python code
-            completed = subprocess.run([sys.executable, temp_file], 
-                                     text=True, capture_output=True, cwd=os.getcwd())
+            if limits is None:
+                limits = limits_for("python.execute")
+            pool = get_pool()
+            temp_file = None
+            try:
+                with tracing.span("subprocess.spawn", pooled=pool is not None):
+                    # Create a temporary file for the Python code; a pooled run
+                    # gets the code over its socket but still sees this file as
+                    # __file__, so both paths behave like "python temp_file"
+                    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
+                        f.write(code)
+                        temp_file = f.name
 
-            # Clean up
-            os.unlink(temp_file)
+                    if pool is not None:
+                        # Fork from a pre-warmed interpreter
+                        proc = pool.spawn(code, os.getcwd(), limits=limits, path=temp_file)
+                    else:
+                        # Execute the Python code
+                        proc = subprocess.Popen([sys.executable, temp_file], stdout=subprocess.PIPE,
+                                                stderr=subprocess.PIPE, cwd=os.getcwd(),
+                                                **popen_kwargs())
+                        limit_process(proc, limits)
+                with tracing.span("subprocess.run", pid=proc.pid) as run_span:
+                    captured = run_process(proc, on_output=on_output, spill=spill, limits=limits)
+                    run_span.set(returncode=captured["returncode"])
+                metrics.observe_subprocess("python.execute", captured)
+            finally:
+                # Clean up
+                if temp_file:
+                    os.unlink(temp_file)
 
-            stdout = completed.stdout.strip()
-            stderr = completed.stderr.strip()
-            returncode = completed.returncode
+            stdout = captured.pop("stdout").strip()
+            stderr = captured.pop("stderr").strip()
 
             response = {
                 "stdout": stdout if stdout else "<EMPTY STDOUT>",
                 "stderr": stderr if stderr else "<EMPTY STDERR>", 
-                "returncode": returncode,
+                **captured,
             }
             
             return response
@@ -203,140 +504,162 @@ class PythonMCPHandler(BaseHTTPRequestHandler):
 
 
 
-class WebMCPHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        # Suppress access logs
-        pass
-        
-    def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
-        response = self.handle_json_rpc(body)
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(response.encode())
+class WebMCPHandler(MCPRequestHandler):
+    metrics_label = "web"
+    tools = [
+        {
+            "name": "web.fetch",
+            "description": "Fetch content from any URL",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "description": "URL to fetch content from"}
+                },
+                "required": ["url"]
+            }
+        },
+        {
+            "name": "web.fetch_many",
+            "description": "Fetch content from several URLs concurrently; results keep input order",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "urls": {"type": "array", "items": {"type": "string"}, "description": "URLs to fetch"},
+                    "concurrency": {"type": "integer", "description": "Maximum downloads in flight"},
+                    "timeout": {"type": "number", "description": "Seconds allowed per URL"}
+                },
+                "required": ["urls"]
+            }
+        },
+        {
+            "name": "web.search",
+            "description": "Search the web for information",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Search query"}
+                },
+                "required": ["query"]
+            }
+        },
+        {
+            "name": "web.post",
+            "description": "Send POST request to a URL",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "url": {"type": "string", "description": "URL to post to"},
+                    "data": {"type": "object", "description": "Data to send"},
+                    "headers": {"type": "object", "description": "HTTP headers"}
+                },
+                "required": ["url"]
+            }
+        }
+    ]
+    rpc_methods = {
+        "web.fetch": "rpc_web_fetch",
+        "web.fetch_many": "rpc_web_fetch_many",
+        "web.search": "rpc_web_search",
+        "web.post": "rpc_web_post",
+    }
 
-    def handle_json_rpc(self, body):
-        try:
-            request = json.loads(body)
-            method = request.get("method")
-            params = request.get("params", {})
-            request_id = request.get("id")
-
-            if method == "tools/list":
-                # Return list of available web tools
-                tools = [
-                    {
-                        "name": "web.fetch",
-                        "description": "Fetch content from any URL",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "url": {"type": "string", "description": "URL to fetch content from"}
-                            },
-                            "required": ["url"]
-                        }
-                    },
-                    {
-                        "name": "web.search",
-                        "description": "Search the web for information",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "query": {"type": "string", "description": "Search query"}
-                            },
-                            "required": ["query"]
-                        }
-                    },
-                    {
-                        "name": "web.post",
-                        "description": "Send POST request to a URL",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "url": {"type": "string", "description": "URL to post to"},
-                                "data": {"type": "object", "description": "Data to send"},
-                                "headers": {"type": "object", "description": "HTTP headers"}
-                            },
-                            "required": ["url"]
-                        }
-                    }
-                ]
-                return json.dumps({"jsonrpc": "2.0", "result": {"tools": tools}, "id": request_id})
-
-            elif method == "web.fetch":
-                url = params.get("url")
-                result = self.web_fetch(url)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            elif method == "web.search":
-                query = params.get("query")
-                result = self.web_search(query)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            elif method == "web.post":
-                url = params.get("url")
-                data = params.get("data", {})
-                headers = params.get("headers", {})
-                result = self.web_post(url, data, headers)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            else:
-                return json.dumps({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": "Method not found"},
-                    "id": request_id
-                })
+    def rpc_web_fetch(self, params):
+        return self.web_fetch(params.get("url"))
 
-        except Exception as e:
-            return json.dumps({
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": str(e)},
-                "id": request_id
-            })
+    def rpc_web_fetch_many(self, params):
+        return self.web_fetch_many(params.get("urls"), params.get("concurrency"), params.get("timeout"))
+
+    def rpc_web_search(self, params):
+        return self.web_search(params.get("query"))
 
-    def web_fetch(self, url):
+    def rpc_web_post(self, params):
+        return self.web_post(params.get("url"), params.get("data", {}), params.get("headers", {}))
+
+    def web_fetch(self, url, timeout=WEB_FETCH_TIMEOUT, extract_in_pool=False):
         """Generic web content fetcher"""
         try:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
             
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            content = response.text
+            http_cache = get_http_cache()
+            page = http_cache.fetch(url, headers=headers, timeout=timeout, extract=not extract_in_pool)
             
-            # Extract useful information based on content type
-            if "job" in url.lower() or "career" in url.lower():
-                content = self.extract_job_info(content)
-            elif "news" in url.lower() or "article" in url.lower():
-                content = self.extract_article_info(content)
-            elif "weather" in url.lower():
-                content = self.extract_weather_info(content)
-            else:
-                # Generic content extraction
-                content = self.extract_generic_info(content)
+            # The body is streamed and extracted as it arrives (see
+            # web_cache.read_body), or handed to the extraction pool once
+            # downloaded. The extracted text is cached with the page, so a
+            # cache hit or a 304 revalidation skips the download as well
+            content = page["derived"].get("text")
+            if content is None:
+                extract = extract_text_pooled if extract_in_pool else extract_text
+                content = extract(page["text"] or "")
+                if page["cache"] != "bypass":
+                    http_cache.set_derived(url, "text", content)
+            if page.get("binary"):
+                content_type = page["headers"].get("Content-Type", "unknown type")
+                content = f"[Binary content ({content_type}) was not downloaded]"
             
             return {
                 "url": url,
-                "status_code": response.status_code,
+                "status_code": page["status_code"],
                 "content": content[:8000],  # Limit content size
                 "content_length": len(content),
+                "complete": page.get("complete", True),
+                "timed_out": page.get("timed_out", False),
+                "bytes_transferred": page.get("bytes_transferred"),
+                "declared_length": page.get("declared_length"),
+                "cache": page["cache"],
                 "returncode": 0
             }
             
         except Exception as e:
             return {"url": url, "error": str(e), "returncode": 1}
 
+    def web_fetch_many(self, urls, concurrency=None, timeout=None):
+        """Fetch several URLs concurrently.
+
+        At most ``concurrency`` downloads run at once, and at most
+        WEB_POOL_SIZE per host. Each URL gets ``timeout`` seconds. Extraction
+        runs in the extraction process pool, so parsing one page does not
+        hold up the downloads. Results keep input order; a failing URL gets
+        its own error entry and does not fail the call.
+        """
+        if not isinstance(urls, list) or not urls:
+            return {"error": "urls must be a non-empty list of strings", "returncode": 1}
+        if len(urls) > WEB_FETCH_MANY_MAX_URLS:
+            return {"error": f"Too many URLs: {len(urls)} (max {WEB_FETCH_MANY_MAX_URLS})", "returncode": 1}
+        if not isinstance(concurrency, int) or concurrency < 1:
+            concurrency = WEB_FETCH_MANY_CONCURRENCY
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            timeout = WEB_FETCH_TIMEOUT
+
+        # Each distinct URL is fetched once
+        unique = list(dict.fromkeys(url for url in urls if isinstance(url, str)))
+        workers = max(1, min(concurrency, WEB_FETCH_MANY_MAX_CONCURRENCY, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="web-fetch") as pool:
+            fetched = dict(zip(unique, pool.map(
+                lambda url: self.web_fetch(url, timeout, extract_in_pool=True), unique)))
+
+        results = [
+            fetched[url] if isinstance(url, str) else {"url": url, "error": "url must be a string", "returncode": 1}
+            for url in urls
+        ]
+        failed = sum(1 for r in results if r.get("returncode", 1) != 0)
+        return {
+            "results": [dict(r, index=i) for i, r in enumerate(results)],
+            "count": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "returncode": 0 if failed < len(results) else 1
+        }
+
     def web_search(self, query):
         """Generic web search using DuckDuckGo"""
         try:
             # Use DuckDuckGo instant answer API
             url = f"https://api.duckduckgo.com/?q={quote_plus(query)}&format=json&no_html=1"
             
-            response = requests.get(url, timeout=10)
+            response = session_for(url).get(url, timeout=10)
             data = response.json()
             
             # Extract relevant info
@@ -371,7 +694,7 @@ class WebMCPHandler(BaseHTTPRequestHandler):
     def web_post(self, url, data, headers):
         """Generic POST request handler"""
         try:
-            response = requests.post(url, json=data, headers=headers, timeout=10)
+            response = session_for(url).post(url, json=data, headers=headers, timeout=10)
             
             return {
                 "url": url,
@@ -384,160 +707,242 @@ class WebMCPHandler(BaseHTTPRequestHandler):
             return {"url": url, "error": str(e), "returncode": 1}
 
 
-    def extract_generic_info(self, html):
-        """Generic content extraction for any webpage"""
-        # Remove script and style tags
-        html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-        html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-        
-        # Extract text from common content areas
-        patterns = [
-            r'<h[1-6][^>]*>([^<]*)</h[1-6]>',
-            r'<p[^>]*>(.*?)</p>',
-            r'<div[^>]*class="[^"]*content[^"]*"[^>]*>(.*?)</div>',
-            r'<div[^>]*class="[^"]*main[^"]*"[^>]*>(.*?)</div>',
-            r'<article[^>]*>(.*?)</article>',
-            r'<section[^>]*>(.*?)</section>'
-        ]
-        
-        extracted = []
-        for pattern in patterns:
-            matches = re.findall(pattern, html, re.IGNORECASE | re.DOTALL)
-            for match in matches[:2]:  # Limit matches per pattern
-                # Clean up the extracted text
-                clean_text = re.sub(r'<[^>]+>', '', match)  # Remove HTML tags
-                clean_text = re.sub(r'\s+', ' ', clean_text)  # Normalize whitespace
-                clean_text = clean_text.strip()
-                if len(clean_text) > 20:  # Only keep substantial content
-                    extracted.append(clean_text)
-        
-        if extracted:
-            return "\n\n".join(extracted[:10])  # Limit to 10 extracts
-        else:
-            # Last resort: extract any text content
-            text_content = re.sub(r'<[^>]+>', '', html)
-            text_content = re.sub(r'\s+', ' ', text_content)
-            return text_content[:2000]  # Limit to 2000 characters
+_ai_cache = ResultCache(
+    max_entries=AI_CACHE_MAX_ENTRIES,
+    ttl=AI_CACHE_TTL,
+    disk=DiskCache(AI_CACHE_DIR, AI_CACHE_MAX_BYTES) if AI_CACHE_DIR else None,
+)
 
 
+class AIMCPHandler(MCPRequestHandler):
+    metrics_label = "ai"
+    model = AI_MCP_MODEL
+    tools = [
+        {
+            "name": "ai.summarize",
+            "description": "Summarize text using AI",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string", "description": "Text to summarize"},
+                    "style": {"type": "string", "enum": ["professional", "bullet_points", "brief"], "default": "professional"}
+                },
+                "required": ["text"]
+            }
+        },
+        {
+            "name": "ai.analyze",
+            "description": "Analyze text for specific information",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string", "description": "Text to analyze"},
+                    "type": {"type": "string", "enum": ["skills", "sentiment", "keywords", "structure", "general"], "default": "general"}
+                },
+                "required": ["text"]
+            }
+        },
+        {
+            "name": "ai.generate",
+            "description": "Generate text based on prompt",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "prompt": {"type": "string", "description": "Prompt for text generation"}
+                },
+                "required": ["prompt"]
+            }
+        },
+        {
+            "name": "ai.summarize_batch",
+            "description": "Summarize many texts in one call; results come back in input order",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "texts": {"type": "array", "items": {"type": "string"}, "description": "Texts to summarize"},
+                    "style": {"type": "string", "enum": ["professional", "bullet_points", "brief"], "default": "professional"},
+                    "concurrency": {"type": "integer", "description": "Maximum parallel requests"}
+                },
+                "required": ["texts"]
+            }
+        },
+        {
+            "name": "ai.analyze_batch",
+            "description": "Analyze many texts in one call; results come back in input order",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "texts": {"type": "array", "items": {"type": "string"}, "description": "Texts to analyze"},
+                    "type": {"type": "string", "enum": ["skills", "sentiment", "keywords", "structure", "general"], "default": "general"},
+                    "concurrency": {"type": "integer", "description": "Maximum parallel requests"}
+                },
+                "required": ["texts"]
+            }
+        }
+    ]
+    rpc_methods = {
+        "ai.summarize": "rpc_ai_summarize",
+        "ai.analyze": "rpc_ai_analyze",
+        "ai.generate": "rpc_ai_generate",
+        "ai.summarize_batch": "rpc_ai_summarize_batch",
+        "ai.analyze_batch": "rpc_ai_analyze_batch",
+        "ai.stats": "rpc_ai_stats",
+    }
 
-class AIMCPHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        # Suppress access logs
-        pass
-        
-    def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length)
-        response = self.handle_json_rpc(body)
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(response.encode())
 
-    def handle_json_rpc(self, body):
-        try:
-            request = json.loads(body)
-            method = request.get("method")
-            params = request.get("params", {})
-            request_id = request.get("id")
-
-            if method == "tools/list":
-                # Return list of available AI tools
-                tools = [
-                    {
-                        "name": "ai.summarize",
-                        "description": "Summarize text using AI",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "text": {"type": "string", "description": "Text to summarize"},
-                                "style": {"type": "string", "enum": ["professional", "bullet_points", "brief"], "default": "professional"}
-                            },
-                            "required": ["text"]
-                        }
-                    },
-                    {
-                        "name": "ai.analyze",
-                        "description": "Analyze text for specific information",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "text": {"type": "string", "description": "Text to analyze"},
-                                "type": {"type": "string", "enum": ["skills", "sentiment", "keywords", "structure", "general"], "default": "general"}
-                            },
-                            "required": ["text"]
-                        }
-                    },
-                    {
-                        "name": "ai.generate",
-                        "description": "Generate text based on prompt",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "prompt": {"type": "string", "description": "Prompt for text generation"}
-                            },
-                            "required": ["prompt"]
-                        }
-                    }
-                ]
-                return json.dumps({"jsonrpc": "2.0", "result": {"tools": tools}, "id": request_id})
-
-            elif method == "ai.summarize":
-                text = params.get("text")
-                style = params.get("style", "professional")
-                result = self.summarize_text(text, style)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            elif method == "ai.analyze":
-                text = params.get("text")
-                analysis_type = params.get("type", "general")
-                result = self.analyze_text(text, analysis_type)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            elif method == "ai.generate":
-                prompt = params.get("prompt")
-                result = self.generate_text(prompt)
-                return json.dumps({"jsonrpc": "2.0", "result": result, "id": request_id})
-            
-            else:
-                return json.dumps({
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": "Method not found"},
-                    "id": request_id
-                })
+    def cached_call(self, method, params, compute):
+        """Serve ``method(params)`` from the result cache, computing it at most
+        once across concurrent identical requests. Errors are not cached."""
+        if method not in AI_CACHED_METHODS:
+            return compute()
+        key = content_key(method, params, self.model)
+        return _ai_cache.get_or_compute(key, compute, cacheable=lambda r: r.get("returncode") == 0)
 
-        except Exception as e:
-            return json.dumps({
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": str(e)},
-                "id": request_id
-            })
+    def run_batch(self, texts, concurrency, run_one):
+        """Run ``run_one(text)`` for every text with bounded concurrency.
+
+        Results keep input order; a failing item gets its own error entry
+        and does not fail the batch.
+        """
+        if not isinstance(texts, list) or not texts:
+            return {"error": "texts must be a non-empty list of strings", "returncode": 1}
+        if len(texts) > AI_BATCH_MAX_ITEMS:
+            return {"error": f"Batch too large: {len(texts)} texts (max {AI_BATCH_MAX_ITEMS})", "returncode": 1}
+        if not isinstance(concurrency, int) or concurrency < 1:
+            concurrency = AI_BATCH_CONCURRENCY
+        workers = min(concurrency, AI_BATCH_MAX_CONCURRENCY, len(texts))
+
+        def run_item(text):
+            if not isinstance(text, str):
+                return {"error": "text must be a string", "returncode": 1}
+            try:
+                return run_one(text)
+            except Exception as e:
+                return {"error": str(e), "returncode": 1}
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-batch") as pool:
+            results = list(pool.map(run_item, texts))
+
+        failed = sum(1 for r in results if r.get("returncode", 1) != 0)
+        return {
+            "results": [dict(r, index=i) for i, r in enumerate(results)],
+            "count": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "returncode": 0 if failed < len(results) else 1
+        }
+
+    def rpc_ai_summarize(self, params):
+        text = params.get("text")
+        style = params.get("style", "professional")
+        return self.cached_call("ai.summarize", {"text": text, "style": style},
+                                lambda: self.summarize_text(text, style))
+
+    def rpc_ai_analyze(self, params):
+        text = params.get("text")
+        analysis_type = params.get("type", "general")
+        return self.cached_call("ai.analyze", {"text": text, "type": analysis_type},
+                                lambda: self.analyze_text(text, analysis_type))
+
+    def rpc_ai_generate(self, params):
+        prompt = params.get("prompt")
+        return self.cached_call("ai.generate", {"prompt": prompt},
+                                lambda: self.generate_text(prompt))
+
+    def rpc_ai_summarize_batch(self, params):
+        style = params.get("style", "professional")
+        return self.run_batch(
+            params.get("texts"), params.get("concurrency"),
+            lambda text: self.rpc_ai_summarize({"text": text, "style": style})
+        )
+
+    def rpc_ai_analyze_batch(self, params):
+        analysis_type = params.get("type", "general")
+        return self.run_batch(
+            params.get("texts"), params.get("concurrency"),
+            lambda text: self.rpc_ai_analyze({"text": text, "type": analysis_type})
+        )
+
+    def rpc_ai_stats(self, params):
+        return {"cache": _ai_cache.stats()}
+
+    def complete(self, prompt, max_tokens, temperature):
+        """Single chat completion; returns the stripped reply text."""
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        metrics.observe_completion(self.model, getattr(response, "usage", None))
+        return response.choices[0].message.content.strip()
+
+    def map_reduce(self, text, instruction, map_instruction, max_tokens, temperature):
+        """Apply ``instruction`` to ``text``, chunking it if it is long.
+
+        Short inputs take the single-call fast path. Longer ones are cut to
+        AI_MAX_INPUT_TOKENS, split into overlapping chunks, condensed in
+        parallel with ``map_instruction`` (repeating while the notes are still
+        too long, at most AI_MAX_REDUCE_ROUNDS times), and the instruction is
+        then applied once to the combined notes.
+        Returns ``(reply, details)``.
+        """
+        input_tokens = count_tokens(text)
+        if input_tokens <= AI_SINGLE_CALL_TOKENS:
+            return self.complete(f"{instruction}:\n\n{text}", max_tokens, temperature), {}
+
+        truncated = input_tokens > AI_MAX_INPUT_TOKENS
+        if truncated:
+            text = truncate_to_tokens(text, AI_MAX_INPUT_TOKENS)
+        parts = split_into_chunks(text, AI_CHUNK_TOKENS, AI_CHUNK_OVERLAP_TOKENS)
+        details = {"input_tokens": input_tokens, "chunks": len(parts), "truncated": truncated}
+
+        for _round in range(AI_MAX_REDUCE_ROUNDS):
+            parts = self._map_chunks(parts, map_instruction)
+            combined = "\n\n".join(parts)
+            if len(parts) == 1 or count_tokens(combined) <= AI_SINGLE_CALL_TOKENS:
+                break
+            parts = split_into_chunks(combined, AI_CHUNK_TOKENS)
+        combined = truncate_to_tokens(combined, AI_SINGLE_CALL_TOKENS)
+
+        prompt = (f"{instruction}. The text below is a set of notes on consecutive "
+                  f"sections of one longer document:\n\n{combined}")
+        return self.complete(prompt, max_tokens, temperature), details
+
+    def _map_chunks(self, chunks, map_instruction):
+        total = len(chunks)
+
+        def condense(item):
+            i, chunk = item
+            return self.complete(f"{map_instruction} (part {i + 1} of {total}):\n\n{chunk}",
+                                 AI_MAP_MAX_TOKENS, 0.2)
+
+        workers = min(AI_MAP_CONCURRENCY, total)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-map") as pool:
+            return list(pool.map(condense, enumerate(chunks)))
 
     def summarize_text(self, text, style="professional"):
         """Summarize text using OpenAI API"""
         if style == "professional":
-            prompt = f"Provide a professional 2-3 sentence summary:\n\n{text}"
+            instruction = "Provide a professional 2-3 sentence summary"
         elif style == "bullet_points":
-            prompt = f"Create bullet-point summary:\n\n{text}"
+            instruction = "Create bullet-point summary"
         elif style == "brief":
-            prompt = f"Summarize in 1 sentence:\n\n{text}"
+            instruction = "Summarize in 1 sentence"
         else:
-            prompt = f"Summarize this text:\n\n{text}"
+            instruction = "Summarize this text"
         
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=300,
-                temperature=0.3
+            summary, details = self.map_reduce(
+                text, instruction,
+                "Summarize this section of a longer document, keeping key facts, names and numbers",
+                max_tokens=300, temperature=0.3
             )
             
-            summary = response.choices[0].message.content.strip()
-            
             return {
                 "summary": summary,
                 "style": style,
+                **details,
                 "returncode": 0
             }
             
@@ -546,29 +951,27 @@ class AIMCPHandler(BaseHTTPRequestHandler):
 
     def analyze_text(self, text, analysis_type="general"):
         """Analyze text for specific information"""
-        prompts = {
-            "skills": f"Extract all technical skills and categorize them:\n\n{text}",
-            "sentiment": f"Analyze the sentiment and tone of this text:\n\n{text}",
-            "keywords": f"Extract the most important keywords and topics:\n\n{text}",
-            "structure": f"Analyze the structure and organization of this content:\n\n{text}",
-            "general": f"Provide a detailed analysis of this text:\n\n{text}"
+        instructions = {
+            "skills": "Extract all technical skills and categorize them",
+            "sentiment": "Analyze the sentiment and tone of this text",
+            "keywords": "Extract the most important keywords and topics",
+            "structure": "Analyze the structure and organization of this content",
+            "general": "Provide a detailed analysis of this text"
         }
         
-        prompt = prompts.get(analysis_type, prompts["general"])
+        instruction = instructions.get(analysis_type, instructions["general"])
         
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.2
+            analysis, details = self.map_reduce(
+                text, instruction,
+                f"Take notes on this section of a longer document for the task '{instruction}'",
+                max_tokens=500, temperature=0.2
             )
             
-            analysis = response.choices[0].message.content.strip()
-            
             return {
                 "analysis": analysis,
                 "type": analysis_type,
+                **details,
                 "returncode": 0
             }
             
@@ -578,14 +981,7 @@ class AIMCPHandler(BaseHTTPRequestHandler):
     def generate_text(self, prompt):
         """Generate text based on prompt"""
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.7
-            )
-            
-            generated_text = response.choices[0].message.content.strip()
+            generated_text = self.complete(prompt, max_tokens=800, temperature=0.7)
             
             return {
                 "text": generated_text,
@@ -596,25 +992,57 @@ class AIMCPHandler(BaseHTTPRequestHandler):
             return {"error": str(e), "returncode": 1}
 
 
-def start_ai_server(host="localhost", port=8002):
-    server = HTTPServer((host, port), AIMCPHandler)
-    print(f"[AI MCP] Running at http://{host}:{port}")
-    server.serve_forever()
+# ====================
+# GATEWAY
+# ====================
+class GatewayMCPHandler(TerminalMCPHandler, PythonMCPHandler, WebMCPHandler, AIMCPHandler):
+    """Every MCP method on one port: the four handlers' dispatch tables
+    merged, and one tools/list with all their tools."""
+    tools = TerminalMCPHandler.tools + PythonMCPHandler.tools + WebMCPHandler.tools + AIMCPHandler.tools
+    rpc_methods = {
+        **TerminalMCPHandler.rpc_methods,
+        **PythonMCPHandler.rpc_methods,
+        **WebMCPHandler.rpc_methods,
+        **AIMCPHandler.rpc_methods,
+    }
+    metrics_label = "gateway"
+    streaming_methods = TerminalMCPHandler.streaming_methods + PythonMCPHandler.streaming_methods
+
+
+def start_gateway_server(host="localhost", port=8000, max_workers=None, max_queue=None):
+    pool = get_pool()
+    if pool is not None:
+        threading.Thread(target=pool.warm, daemon=True).start()
+    try:
+        serve(GatewayMCPHandler, host, port, "MCP GATEWAY", max_workers, max_queue)
+    finally:
+        if pool is not None:
+            pool.close()
+        close_extract_pool()
+
+
+def start_ai_server(host="localhost", port=8002, max_workers=None, max_queue=None):
+    serve(AIMCPHandler, host, port, "AI MCP", max_workers, max_queue)
 
 
+def start_web_server(host="localhost", port=8003, max_workers=None, max_queue=None):
+    try:
+        serve(WebMCPHandler, host, port, "Web MCP", max_workers, max_queue)
+    finally:
+        close_extract_pool()
 
-def start_web_server(host="localhost", port=8003):
-    server = HTTPServer((host, port), WebMCPHandler)
-    print(f"[Web MCP] Running at http://{host}:{port}")
-    server.serve_forever()
 
+def start_terminal_mcp_server(host="localhost", port=8000, max_workers=None, max_queue=None):
+    serve(TerminalMCPHandler, host, port, "TERMINAL MCP", max_workers, max_queue)
 
-def start_terminal_mcp_server(host="localhost", port=8000):
-    server = HTTPServer((host, port), TerminalMCPHandler)
-    print(f"[TERMINAL MCP] Running at http://{host}:{port}")
-    server.serve_forever()
 
-def start_python_mcp_server(host="localhost", port=8001):
-    server = HTTPServer((host, port), PythonMCPHandler)
-    print(f"[PYTHON MCP] Running at http://{host}:{port}")
-    server.serve_forever() 
\ No newline at end of file
+def start_python_mcp_server(host="localhost", port=8001, max_workers=None, max_queue=None):
+    pool = get_pool()
+    if pool is not None:
+        # Pay interpreter startup and preload imports before the first request
+        threading.Thread(target=pool.warm, daemon=True).start()
+    try:
+        serve(PythonMCPHandler, host, port, "PYTHON MCP", max_workers, max_queue)
+    finally:
+        if pool is not None:
+            pool.close()
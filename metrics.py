@@ -0,0 +1,253 @@
+"""
+Prometheus metrics for the MCP servers.
+
+``GET /metrics`` on METRICS_PORT returns the process's metrics in the
+Prometheus text format (version 0.0.4): JSON-RPC requests, errors, in-flight
+requests and latency per server and method, connections held and rejected,
+subprocess wall/CPU time and output bytes per executor, and model token
+usage of the AI handler.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_LATENCY_BUCKETS, METRICS_PORT
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ====================
+# METRIC TYPES
+# ====================
+_registry = []
+
+
+class Metric:
+    """A named family of series, one per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{self._label_text(key)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=METRICS_LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _number(bound))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{self._label_text(key, [('le', '+Inf')])} {series['count']}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(series['sum'])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {series['count']}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render() -> bytes:
+    """All metrics of this process in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode()
+
+
+# ====================
+# ENDPOINT
+# ====================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    timeout = 10
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(host, port=METRICS_PORT):
+    """Serve ``GET /metrics`` on ``host:port`` from a daemon thread.
+
+    One listener per process, started by the first caller, apart from the MCP
+    servers' worker pools so a saturated server can still be scraped.
+    Returns the server, or None if ``port`` is None.
+    """
+    global _server
+    with _server_lock:
+        if _server is None and port is not None:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+            _server = server
+        return _server
+
+
+def stop_server():
+    """Stop the listener started by start_server(), if any."""
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+# ====================
+# MCP SERVER METRICS
+# ====================
+REQUESTS = Counter("mcp_requests_total", "JSON-RPC requests handled, batch items counted one by one.",
+                   ("server", "method"))
+ERRORS = Counter("mcp_request_errors_total",
+                 "Requests answered with a JSON-RPC error (code) or a failed tool result (code=\"tool\").",
+                 ("server", "method", "code"))
+IN_FLIGHT = Gauge("mcp_requests_in_flight", "JSON-RPC requests being handled right now.", ("server",))
+LATENCY = Histogram("mcp_request_duration_seconds", "Time to handle one JSON-RPC request.", ("server", "method"))
+CONNECTIONS = Gauge("mcp_connections", "Connections holding a worker or waiting for one.", ("server",))
+REJECTED = Counter("mcp_connections_rejected_total", "Connections refused with \"server busy\" at capacity.",
+                   ("server",))
+
+SUBPROCESS_RUNS = Counter("mcp_subprocess_runs_total", "Subprocesses run by the executors, by outcome.",
+                          ("method", "outcome"))
+SUBPROCESS_WALL = Histogram("mcp_subprocess_wall_seconds", "Wall-clock time of executor subprocesses.",
+                            ("method",))
+SUBPROCESS_CPU = Counter("mcp_subprocess_cpu_seconds_total", "CPU time used by executor subprocesses.",
+                         ("method", "mode"))
+SUBPROCESS_OUTPUT = Counter("mcp_subprocess_output_bytes_total", "Output written by executor subprocesses.",
+                            ("method", "stream"))
+
+AI_COMPLETIONS = Counter("mcp_ai_completions_total", "Chat completions requested by the AI handler.", ("model",))
+AI_TOKENS = Counter("mcp_ai_tokens_total", "Model tokens used by the AI handler.", ("model", "kind"))
+
+
+def observe_request(server, method, seconds, response):
+    REQUESTS.inc(server=server, method=method)
+    LATENCY.observe(seconds, server=server, method=method)
+    code = _error_code(response)
+    if code is not None:
+        ERRORS.inc(server=server, method=method, code=code)
+
+
+def _error_code(response):
+    if not isinstance(response, dict):
+        return None
+    if "error" in response:
+        return str((response["error"] or {}).get("code", ""))
+    result = response.get("result")
+    if isinstance(result, dict) and result.get("returncode") not in (0, None):
+        return "tool"
+    return None
+
+
+def observe_subprocess(method, captured):
+    """Record one run_process() result."""
+    if captured.get("timed_out"):
+        outcome = "timed_out"
+    elif captured.get("killed"):
+        outcome = "killed"
+    else:
+        outcome = "ok" if captured.get("returncode") == 0 else "failed"
+    SUBPROCESS_RUNS.inc(method=method, outcome=outcome)
+    resources = captured.get("resources") or {}
+    if "wall_time" in resources:
+        SUBPROCESS_WALL.observe(resources["wall_time"], method=method)
+    for mode in ("user", "system"):
+        if f"cpu_{mode}" in resources:
+            SUBPROCESS_CPU.inc(resources[f"cpu_{mode}"], method=method, mode=mode)
+    for stream in ("stdout", "stderr"):
+        SUBPROCESS_OUTPUT.inc(captured.get(f"{stream}_bytes", 0), method=method, stream=stream)
+
+
+def observe_completion(model, usage):
+    """Record one chat completion and its ``usage`` (None if the API sent none)."""
+    AI_COMPLETIONS.inc(model=model)
+    if usage is None:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            AI_TOKENS.inc(tokens, model=model, kind=kind)
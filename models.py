@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Union
+from typing import List, Union
 
 class TerminalParams(BaseModel):
     command: str
@@ -11,4 +11,7 @@ class PythonParams(BaseModel):
 
 class ToolCall(BaseModel):
     method: str
-    params: Union[TerminalParams, PythonParams] 
\ No newline at end of file
+    params: Union[TerminalParams, PythonParams]
+
+class AgentAction(BaseModel):
+    calls: List[ToolCall]
@@ -0,0 +1,231 @@
+import json
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+
+from config import PYTHON_POOL_SIZE, PYTHON_POOL_PRELOAD, PYTHON_POOL_MAX_RUNS
+from python_worker import send_message, recv_message
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python_worker.py")
+
+
+def pool_supported() -> bool:
+    """The forking pool needs POSIX fork and fd passing over Unix sockets."""
+    return hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+
+# ====================
+# FORKED PROCESS
+# ====================
+class ForkedProcess:
+    """Handle to one python.execute run forked from a pool worker.
+
+    Mirrors the parts of ``subprocess.Popen`` the executors use: ``pid``,
+    ``stdout``/``stderr`` pipes, ``wait()``, ``returncode`` and ``kill()``.
+    """
+
+    def __init__(self, pool, worker, pid, stdout, stderr):
+        self._pool = pool
+        self._worker = worker
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+
+    def wait(self, timeout=None):
+        if self.returncode is not None:
+            return self.returncode
+        # settimeout(0) would make the socket non-blocking instead
+        self._worker.sock.settimeout(None if timeout is None else max(timeout, 0.001))
+        try:
+            status, _ = recv_message(self._worker.sock)
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(f"python.execute[{self.pid}]", timeout)
+        except (OSError, EOFError):
+            status = None
+        finally:
+            if self._worker.sock.gettimeout() is not None:
+                self._worker.sock.settimeout(None)
+
+        if status is None:
+            # The worker died underneath us; report it like a crashed process.
+            self.returncode = -signal.SIGKILL
+            self._worker.broken = True
+        else:
+            self.returncode = status["returncode"]
+            self.rusage = status["rusage"]
+        self._pool.release(self._worker)
+        return self.returncode
+
+    def kill(self):
+        """Kill the run and everything it started (it leads its own session)."""
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+# ====================
+# WORKERS
+# ====================
+class _Worker:
+    """One pre-warmed interpreter that forks a child per request."""
+
+    def __init__(self, preload):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", WORKER_SCRIPT, str(child_sock.fileno()), json.dumps(preload)],
+            pass_fds=(child_sock.fileno(),),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            close_fds=True,
+        )
+        child_sock.close()
+        self.sock = parent_sock
+        self.runs = 0
+        self.broken = False
+        hello, _ = recv_message(self.sock)
+        if not hello or not hello.get("ready"):
+            self.close()
+            raise RuntimeError("Python worker failed to start")
+        self.preloaded = hello.get("preloaded", [])
+
+    def alive(self):
+        return not self.broken and self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.sock.close()
+        finally:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+
+class PythonWorkerPool:
+    """Pool of pre-warmed interpreters for python.execute.
+
+    Each worker preloads ``preload`` modules once and forks a fresh child for
+    every run, so calls skip interpreter startup and heavy imports while
+    staying as isolated as a brand-new process. Workers are replaced after
+    ``max_runs`` runs or as soon as one crashes.
+    """
+
+    def __init__(self, size=PYTHON_POOL_SIZE, preload=PYTHON_POOL_PRELOAD, max_runs=PYTHON_POOL_MAX_RUNS):
+        self.size = size
+        self.preload = list(preload)
+        self.max_runs = max_runs
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+
+    def warm(self):
+        """Start every worker up front instead of on first use."""
+        workers = [self._acquire() for _ in range(self.size)]
+        for worker in workers:
+            self.release(worker)
+
+    def spawn(self, code, cwd=None, limits=None, path=None):
+        """Run ``code`` in a fresh fork and return its ForkedProcess.
+
+        ``limits`` are rlimits applied in the child, see python_worker.apply_limits.
+        ``path`` is a script file holding ``code``; the run sees it as
+        ``__file__``, ``sys.argv[0]`` and its directory as ``sys.path[0]``,
+        like ``python path`` would.
+        """
+        worker = self._acquire()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            request = {"code": code, "cwd": cwd or os.getcwd(), "limits": limits, "path": path}
+            send_message(worker.sock, request, fds=(stdout_w, stderr_w))
+            started, _ = recv_message(worker.sock)
+        except Exception:
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            worker.broken = True
+            self.release(worker)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+        if started is None:
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            worker.broken = True
+            self.release(worker)
+            raise RuntimeError("Python worker exited unexpectedly")
+        worker.runs += 1
+        return ForkedProcess(self, worker, started["pid"],
+                             open(stdout_r, "rb", buffering=0), open(stderr_r, "rb", buffering=0))
+
+    def release(self, worker):
+        if self._closed or not worker.alive() or worker.runs >= self.max_runs:
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(worker)
+
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Python worker pool is closed")
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_start = self._started < self.size
+                    if can_start:
+                        self._started += 1
+                if can_start:
+                    try:
+                        return _Worker(self.preload)
+                    except Exception:
+                        with self._lock:
+                            self._started -= 1
+                        raise
+                try:
+                    # Wake up periodically in case a retired worker freed a slot.
+                    worker = self._idle.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            if worker.alive():
+                return worker
+            self._retire(worker)
+
+    def _retire(self, worker):
+        with self._lock:
+            self._started -= 1
+        worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared worker pool, or None if pooling is disabled or unsupported."""
+    global _pool
+    if PYTHON_POOL_SIZE <= 0 or not pool_supported():
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PythonWorkerPool()
+    return _pool
@@ -0,0 +1,212 @@
+"""
+Pre-warmed Python worker ("zygote") used by python_pool.
+
+The worker imports the preload modules once, then waits for requests on a
+Unix socket. Every request is run in a freshly forked child, so each call
+starts from the same clean, already-warmed interpreter state and nothing
+leaks between calls. The worker itself never executes user code.
+
+This file is run as a standalone script and must stay free of heavy
+imports: everything it imports is inherited by every child.
+"""
+import builtins
+import json
+import linecache
+import os
+import signal
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+import socket
+import struct
+import sys
+import traceback
+import types
+
+_HEADER = struct.Struct("!I")
+_MAX_FDS = 4
+
+
+# ====================
+# FRAMING
+# ====================
+def send_message(sock, obj, fds=()):
+    """Send a length-prefixed JSON message, optionally passing file descriptors."""
+    payload = json.dumps(obj).encode()
+    header = _HEADER.pack(len(payload))
+    if fds:
+        socket.send_fds(sock, [header], list(fds))
+    else:
+        sock.sendall(header)
+    sock.sendall(payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError("worker socket closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock):
+    """Receive one message. Returns ``(obj, fds)`` or ``(None, [])`` on EOF."""
+    header, fds, _flags, _addr = socket.recv_fds(sock, _HEADER.size, _MAX_FDS)
+    if not header:
+        return None, []
+    if len(header) < _HEADER.size:
+        header += _recv_exact(sock, _HEADER.size - len(header))
+    (length,) = _HEADER.unpack(header)
+    return json.loads(_recv_exact(sock, length)), fds
+
+
+# ====================
+# RESOURCE LIMITS
+# ====================
+def apply_limits(limits, pid=0):
+    """Apply per-call rlimits to process ``pid`` (0: the current process).
+
+    Known keys are ``cpu_seconds``, ``memory_mb`` (RLIMIT_DATA, so runtimes
+    that reserve a large address space up front still start), ``open_files``
+    and ``processes`` (RLIMIT_NPROC, which counts every process and thread
+    of the user). A limit is never raised above the existing hard limit.
+    Another process is limited with prlimit(), so only on Linux.
+    """
+    if resource is None or not limits or (pid and not hasattr(resource, "prlimit")):
+        return
+    table = (
+        ("cpu_seconds", resource.RLIMIT_CPU, 1),
+        ("memory_mb", resource.RLIMIT_DATA, 1024 * 1024),
+        ("open_files", resource.RLIMIT_NOFILE, 1),
+        ("processes", getattr(resource, "RLIMIT_NPROC", None), 1),
+    )
+    for key, rlimit, scale in table:
+        value = limits.get(key)
+        if value is None or rlimit is None:
+            continue
+        soft = int(value * scale)
+        _old_soft, hard = resource.prlimit(pid, rlimit) if pid else resource.getrlimit(rlimit)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        if key == "cpu_seconds":
+            # SIGXCPU at the soft limit, SIGKILL one second later
+            new_hard = soft + 1 if hard == resource.RLIM_INFINITY else min(soft + 1, hard)
+        else:
+            new_hard = soft
+        if pid:
+            resource.prlimit(pid, rlimit, (soft, new_hard))
+        else:
+            resource.setrlimit(rlimit, (soft, new_hard))
+
+
+# ====================
+# CHILD
+# ====================
+def _run_child(request, stdout_fd, stderr_fd, sock):
+    """Run one request in the forked child. Never returns."""
+    returncode = 1
+    try:
+        sock.close()
+        os.setsid()
+        apply_limits(request.get("limits"))
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+
+        cwd = request.get("cwd") or os.getcwd()
+        os.chdir(cwd)
+        path = request.get("path")
+        # As for "python path": the script's directory comes first on sys.path
+        sys.path[0] = os.path.dirname(os.path.abspath(path)) if path else cwd
+        sys.argv = [path or "<python.execute>"]
+
+        source = request["code"]
+        filename = path or "<python.execute>"
+        # Keep tracebacks showing source lines, as they would for a script file.
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+        main = types.ModuleType("__main__")
+        main.__builtins__ = builtins
+        if path:
+            main.__file__ = path
+        sys.modules["__main__"] = main
+
+        try:
+            exec(compile(source, filename, "exec"), main.__dict__)
+            returncode = 0
+        except SystemExit as e:
+            if e.code is None:
+                returncode = 0
+            elif isinstance(e.code, int):
+                returncode = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException as e:
+            # Drop this function's frame so the traceback starts at user code.
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+            returncode = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(returncode & 0xFF)
+
+
+# ====================
+# WORKER LOOP
+# ====================
+def _rusage_dict(rusage):
+    return {
+        "cpu_user": rusage.ru_utime,
+        "cpu_system": rusage.ru_stime,
+        "max_rss_kb": rusage.ru_maxrss,
+    }
+
+
+def serve(sock, preload):
+    loaded = []
+    for name in preload:
+        try:
+            __import__(name)
+            loaded.append(name)
+        except Exception:
+            pass
+    send_message(sock, {"ready": True, "preloaded": loaded})
+
+    while True:
+        request, fds = recv_message(sock)
+        if request is None:
+            return
+        stdout_fd, stderr_fd = fds[:2]
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, stdout_fd, stderr_fd, sock)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        send_message(sock, {"pid": pid})
+        _pid, status, rusage = os.wait4(pid, 0)
+        send_message(sock, {
+            "returncode": os.waitstatus_to_exitcode(status),
+            "rusage": _rusage_dict(rusage),
+        })
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    control = socket.socket(fileno=int(sys.argv[1]))
+    try:
+        serve(control, json.loads(sys.argv[2]) if len(sys.argv) > 2 else [])
+    except (EOFError, BrokenPipeError, ConnectionResetError):
+        pass
@@ -1,10 +1,188 @@
+import functools
+import os
+import re
+
+from config import SAFETY_CACHE_SIZE
+
+DANGEROUS_KEYWORDS = [
+    "rm ", "shutdown", "reboot", "mkfs", ":(){", "kill", "dd if=", ">:",
+    "> /dev/sd", "> /etc", "mv /", "wget ", "curl ", "nc ", "netcat", "forkbomb"
+]
+
+# Command names that are blocked wherever they appear as the command word of
+# a pipeline stage, list item or subshell, however they are quoted or spelled
+# (``r''m``, ``/bin/rm``, ``sudo rm``, ``$(rm ...)``, ``bash -c 'rm ...'``).
+DANGEROUS_COMMANDS = {
+    "rm", "shutdown", "reboot", "kill", "killall", "pkill", "wget", "curl", "nc", "netcat",
+}
+
+# Keywords are searched in the lowercased command with quotes and backslashes
+# deleted, so r''m -rf / reads rm -rf /. A space in a keyword matches any run
+# of whitespace, and the one after ">" may be missing (">/etc"). One search
+# covers every keyword; no groups, which would make re several times slower.
+# _keyword() names the keyword a match came from.
+_KEYWORD_RE = re.compile("|".join(
+    re.escape(keyword).replace("\\ ", r"\s+").replace(r">\s+", r">\s*") for keyword in DANGEROUS_KEYWORDS
+))
+_WHITESPACE_RE = re.compile(r"\s+")
+_KEYWORD_NAMES = {keyword.replace("> ", ">"): keyword for keyword in DANGEROUS_KEYWORDS}
+
+
+def _keyword(matched):
+    return _KEYWORD_NAMES.get(_WHITESPACE_RE.sub(" ", matched).replace("> ", ">"))
+
+
+# Anything that makes plain whitespace splitting disagree with the shell.
+_SHELL_SYNTAX_RE = re.compile(r"""['"\\$`;|&()<>\t\r\n]""")
+
+# One-pass shell tokenizer following POSIX (shlex posix=True) quoting rules:
+# a word is a run of unquoted text, '...' and "..." strings and backslash
+# escapes; operators end words. Command substitution "$(" and "`" become
+# "(" so their body starts a new command.
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<op>\|\||&&|;;|\|&|\$\(|[|&;()`<>])
+  | (?P<single>'[^']*')
+  | (?P<double>"(?:\\.|[^"\\])*")
+  | (?P<escape>\\.)
+  | (?P<plain>[^\s|&;()`<>'"\\]+)
+  | (?P<bad>.)
+""", re.VERBOSE | re.DOTALL)
+_DQ_ESCAPE_RE = re.compile(r'\\([\\"$`\n])')
+
+_SEPARATORS = {"|", "||", "&&", ";", "&", "(", ")", ";;", "|&"}
+_WRAPPERS = {
+    "sudo", "doas", "env", "nohup", "time", "nice", "exec", "command", "builtin",
+    "xargs", "timeout", "stdbuf", "busybox",
+    "if", "elif", "then", "else", "while", "until", "do", "!", "{",
+}
+_SHELLS = {"sh", "bash", "zsh", "dash", "ksh"}
+# How _check_tokens treats a command word, looked up once per word
+_COMMAND_KINDS = dict.fromkeys(_WRAPPERS, "wrapper")
+_COMMAND_KINDS.update(dict.fromkeys(_SHELLS, "shell"))
+_COMMAND_KINDS.update(dict.fromkeys(DANGEROUS_COMMANDS, "blocked"))
+# A command can only run a blocked program or a shell if one of their names
+# appears as a word in the quote-stripped text; everything else skips the
+# tokenizer.
+_COMMAND_NAMES = "|".join(sorted(map(re.escape, DANGEROUS_COMMANDS | _SHELLS)))
+_COMMAND_NAME_RE = re.compile(r"\b(?:(?:" + _COMMAND_NAMES + r")\b|mkfs)")
+# First gate: one search shows most commands hold neither a keyword nor any
+# of those names, even as a substring, and are safe.
+_SCAN_RE = re.compile(_KEYWORD_RE.pattern + "|" + _COMMAND_NAMES + "|mkfs")
+_ASSIGNMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+
+
+def _tokenize(command):
+    """Split a command the way the shell would; None if it cannot be parsed."""
+    if not _SHELL_SYNTAX_RE.search(command):
+        return command.split()
+    tokens = []
+    word = []
+    for match in _TOKEN_RE.finditer(command):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "space" or kind == "op":
+            if word:
+                tokens.append("".join(word))
+                word = []
+            if kind == "op":
+                tokens.append("(" if text in ("$(", "`") else text)
+        elif kind == "plain":
+            word.append(text)
+        elif kind == "single":
+            word.append(text[1:-1])
+        elif kind == "double":
+            word.append(_DQ_ESCAPE_RE.sub(r"\1", text[1:-1]))
+        elif kind == "escape":
+            word.append(text[1])
+        else:
+            return None  # unterminated quote or trailing backslash
+    if word:
+        tokens.append("".join(word))
+    return tokens
+
+
+def _segments(tokens):
+    """Yield the token lists of each simple command between separators."""
+    segment = []
+    for token in tokens:
+        if token in _SEPARATORS:
+            if segment:
+                yield segment
+            segment = []
+        else:
+            segment.append(token)
+    if segment:
+        yield segment
+
+
+def _command_word(segment):
+    """Return ``(index, name, kind)`` of the program a simple command runs."""
+    i = 0
+    while i < len(segment):
+        token = segment[i]
+        name = os.path.basename(token.lstrip("\\")).lower()
+        kind = _COMMAND_KINDS.get(name)
+        if _ASSIGNMENT_RE.match(token) or token == "$":
+            i += 1
+        elif kind == "wrapper":
+            i += 1
+            # Skip wrapper options and, for timeout, its duration
+            while i < len(segment) and (segment[i].startswith("-") or
+                                        (name == "timeout" and segment[i][:1].isdigit())):
+                i += 1
+        else:
+            return i, name, kind
+    return None, None, None
+
+
+def _check_tokens(tokens, depth=0):
+    for segment in _segments(tokens):
+        index, name, kind = _command_word(segment)
+        if name is None:
+            continue
+        if kind == "blocked" or name.startswith("mkfs"):
+            return f"runs '{name}'"
+        if kind == "shell" and depth < 3:
+            args = segment[index + 1:]
+            if "-c" in args and args.index("-c") + 1 < len(args):
+                reason = _check_command(args[args.index("-c") + 1], depth + 1)
+                if reason:
+                    return reason
+    return None
+
+
+def _check_command(command, depth=0):
+    text = command.lower().replace("'", "").replace('"', "").replace("\\", "")
+    match = _SCAN_RE.search(text)
+    if match is None:
+        return None
+    keyword = _keyword(match.group())
+    if keyword is None:
+        # A name came first; a keyword may still follow
+        match = _KEYWORD_RE.search(text, match.start() + 1)
+        keyword = match and _keyword(match.group())
+    if keyword:
+        return f"contains '{keyword}'"
+    if not _COMMAND_NAME_RE.search(text):
+        return None
+    tokens = _tokenize(command)
+    if tokens is None:
+        return None
+    return _check_tokens(tokens, depth)
+
+
+@functools.lru_cache(maxsize=SAFETY_CACHE_SIZE)
+def command_verdict(command: str):
+    """Return ``(is_safe, reason)`` for a terminal command. Results are cached,
+    so the agent's check and the server's re-check cost one parse."""
+    reason = _check_command(command)
+    return reason is None, reason
+
+
 def is_command_safe(command: str) -> bool:
     """Returns True if the command passes the sandbox check."""
-    dangerous_keywords = [
-        "rm ", "shutdown", "reboot", "mkfs", ":(){", "kill", "dd if=", ">:",
-        "> /dev/sd", "> /etc", "mv /", "wget ", "curl ", "nc ", "netcat", "forkbomb"
-    ]
-    return not any(keyword in command.lower() for keyword in dangerous_keywords)
+    return command_verdict(command)[0]
 
 def is_python_safe(code: str) -> bool:
     """Returns True if the Python code passes basic safety checks."""
@@ -16,5 +194,5 @@ def is_python_safe(code: str) -> bool:
     # Allow some safe subprocess usage
     if "subprocess.run(['pip'" in code or "subprocess.run([sys.executable" in code:
         return True
-    
-    return not any(pattern in code for pattern in dangerous_patterns) 
\ No newline at end of file
+
+    return not any(pattern in code for pattern in dangerous_patterns)
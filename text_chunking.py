@@ -0,0 +1,101 @@
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+# Rough characters-per-token ratio for English text when tiktoken is missing.
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING = "o200k_base"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if tiktoken is None or _encoding_failed:
+        return None
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+                except Exception:
+                    # e.g. the BPE file cannot be downloaded
+                    _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in ``text`` (estimated if tiktoken is unavailable)."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` down to at most ``max_tokens`` tokens."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * CHARS_PER_TOKEN]
+
+
+def clip_middle(text: str, head_tokens: int, tail_tokens: int) -> str:
+    """Keep the first ``head_tokens`` and last ``tail_tokens`` tokens of ``text``,
+    with a marker where the middle was dropped."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= head_tokens + tail_tokens:
+            return text
+        head = encoding.decode(tokens[:head_tokens])
+        tail = encoding.decode(tokens[len(tokens) - tail_tokens:]) if tail_tokens else ""
+        dropped = len(tokens) - head_tokens - tail_tokens
+    else:
+        head_chars, tail_chars = head_tokens * CHARS_PER_TOKEN, tail_tokens * CHARS_PER_TOKEN
+        if len(text) <= head_chars + tail_chars:
+            return text
+        head = text[:head_chars]
+        tail = text[len(text) - tail_chars:] if tail_chars else ""
+        dropped = (len(text) - head_chars - tail_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return f"{head}\n... [{dropped} tokens omitted] ...\n{tail}"
+
+
+def split_into_chunks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list:
+    """Split ``text`` into chunks of at most ``chunk_tokens`` tokens.
+
+    Consecutive chunks share ``overlap_tokens`` tokens so that sentences cut
+    at a boundary appear whole in at least one chunk.
+    """
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, chunk_tokens // 2))
+    step = chunk_tokens - overlap_tokens
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + chunk_tokens])
+                for i in range(0, max(len(tokens) - overlap_tokens, 1), step)]
+
+    # Character windows, nudged back to the nearest whitespace where possible
+    size, stride = chunk_tokens * CHARS_PER_TOKEN, step * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + stride // 2, end)
+            if cut > start:
+                end = cut
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - (size - stride), start + 1)
+    return chunks or [text]
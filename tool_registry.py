@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    MCP_ENDPOINTS, TOOL_REGISTRY_TTL, TOOL_DISCOVERY_TIMEOUT,
+    DEAD_SERVER_BACKOFF, DEAD_SERVER_BACKOFF_MAX
+)
+from mcp_client import rpc
+import tracing
+
+
+# ====================
+# TOOL REGISTRY
+# ====================
+class ToolRegistry:
+    """Cached view of the tools offered by every MCP server.
+
+    All stale servers are queried concurrently. A cached tool list is reused
+    for ``ttl`` seconds and then revalidated with its etag, so an unchanged
+    server answers with a tiny ``notModified`` reply. Servers that fail are
+    remembered and skipped until their backoff expires.
+    """
+
+    def __init__(self, endpoints=None, ttl=TOOL_REGISTRY_TTL, timeout=TOOL_DISCOVERY_TIMEOUT,
+                 backoff=DEAD_SERVER_BACKOFF, backoff_max=DEAD_SERVER_BACKOFF_MAX):
+        # One entry per server: with the gateway layout a single tools/list
+        # call returns every tool.
+        self.endpoints = {}
+        for endpoint, url in (endpoints or MCP_ENDPOINTS).items():
+            if url not in self.endpoints.values():
+                self.endpoints[endpoint] = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._entries = {}  # endpoint -> {"tools", "etag", "fetched_at"}
+        self._dead = {}     # endpoint -> {"retry_at", "backoff"}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.endpoints)),
+                                        thread_name_prefix="tool-discovery")
+
+    def get_tools(self) -> dict:
+        """Return ``{tool_name: {"url", "description", "schema"}}`` for all live servers."""
+        with self._refresh_lock:
+            stale = self._stale_endpoints()
+            if stale:
+                # Bound per call so tools/list requests join the caller's trace
+                futures = [self._pool.submit(tracing.bind(self._fetch), endpoint) for endpoint in stale]
+                for endpoint, future in zip(stale, futures):
+                    self._record(endpoint, future.result())
+            return self._merged()
+
+    def invalidate(self, endpoint=None):
+        """Force a full refetch of one endpoint, or of all of them."""
+        with self._lock:
+            if endpoint and endpoint not in self.endpoints:
+                # Shares a server with another endpoint; refetch that one
+                url = MCP_ENDPOINTS.get(endpoint)
+                endpoint = next((name for name, u in self.endpoints.items() if u == url), endpoint)
+            targets = [endpoint] if endpoint else list(self.endpoints)
+            for name in targets:
+                self._entries.pop(name, None)
+                self._dead.pop(name, None)
+
+    def _stale_endpoints(self):
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for endpoint in self.endpoints:
+                dead = self._dead.get(endpoint)
+                if dead and now < dead["retry_at"]:
+                    continue
+                entry = self._entries.get(endpoint)
+                if entry is None or now - entry["fetched_at"] >= self.ttl:
+                    stale.append(endpoint)
+        return stale
+
+    def _fetch(self, endpoint):
+        entry = self._entries.get(endpoint)
+        params = {"etag": entry["etag"]} if entry and entry.get("etag") else None
+        try:
+            response = rpc(endpoint, "tools/list", params, timeout=self.timeout)
+            return response["result"], None
+        except Exception as e:
+            return None, e
+
+    def _record(self, endpoint, outcome):
+        result, error = outcome
+        now = time.monotonic()
+        with self._lock:
+            if error is not None:
+                previous = self._dead.get(endpoint)
+                backoff = min(previous["backoff"] * 2, self.backoff_max) if previous else self.backoff
+                self._dead[endpoint] = {"retry_at": now + backoff, "backoff": backoff}
+                self._entries.pop(endpoint, None)
+                if previous is None:
+                    print(f"❌ {endpoint} server not available: {error}")
+                return
+
+            self._dead.pop(endpoint, None)
+            entry = self._entries.get(endpoint)
+            if result.get("notModified"):
+                if entry is not None:
+                    entry["fetched_at"] = now
+            else:
+                self._entries[endpoint] = {
+                    "tools": result.get("tools", []),
+                    "etag": result.get("etag"),
+                    "fetched_at": now,
+                }
+
+    def _merged(self):
+        tools = {}
+        with self._lock:
+            for endpoint, entry in self._entries.items():
+                url = self.endpoints[endpoint]
+                for tool in entry["tools"]:
+                    tools[tool["name"]] = {
+                        "url": url,
+                        "description": tool["description"],
+                        "schema": tool["inputSchema"]
+                    }
+        return tools
+
+
+default_registry = ToolRegistry()
@@ -0,0 +1,310 @@
+"""
+Span tracing for agent tasks.
+
+    python tracing.py [trace.jsonl ...] [--last N] [--trace ID]
+
+Each agent task is one trace. Its stages (model calls, tool discovery, MCP
+requests, server handling, subprocess spawn and run, approval prompts) are
+timed as nested spans and appended to TRACE_FILE as JSON lines. The trace
+context travels to the MCP servers in ``params._meta.trace`` of every
+JSON-RPC request, so server-side spans join the task's trace. Run as a
+script, it prints the time breakdown per step and per task.
+"""
+import argparse
+import contextvars
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import TRACE_ENABLED, TRACE_FILE, TRACE_MAX_BYTES
+
+# ====================
+# SPANS
+# ====================
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed stage. ``set()`` adds attributes before it ends."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start")
+
+    def __init__(self, trace_id, parent_id, name, attrs):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NoSpan:
+    """Stands in for a Span when nothing is being recorded."""
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+@contextmanager
+def span(name, root=False, parent=None, **attrs):
+    """Time the block as a span called ``name`` and yield it.
+
+    The span nests under the current one. Outside a trace nothing is
+    recorded unless ``root`` is set (start a new trace) or ``parent`` is a
+    remote context from extract(). Exceptions are recorded and re-raised.
+    """
+    current = _current.get()
+    if not TRACE_ENABLED or (current is None and not root and not parent):
+        yield _NO_SPAN
+        return
+    if parent:
+        new = Span(parent["trace_id"], parent.get("parent_id"), name, attrs)
+    elif current is not None and not root:
+        new = Span(current.trace_id, current.span_id, name, attrs)
+    else:
+        new = Span(uuid.uuid4().hex, None, name, attrs)
+    token = _current.set(new)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield new
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        _write(new, time.perf_counter() - started, error)
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+def bind(fn):
+    """``fn`` running in a copy of the current context, for another thread.
+
+    Bind once per submitted call: a context cannot run in two threads at once.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+# ====================
+# PROPAGATION
+# ====================
+def inject(params):
+    """``params`` plus the current trace context, for an outgoing JSON-RPC request."""
+    current = _current.get()
+    if current is None:
+        return params
+    params = dict(params or {})
+    params["_meta"] = dict(params.get("_meta") or {},
+                           trace={"trace_id": current.trace_id, "parent_id": current.span_id})
+    return params
+
+
+def extract(params):
+    """Split incoming JSON-RPC params into ``(params, remote_context)``."""
+    if not isinstance(params, dict) or "_meta" not in params:
+        return params, None
+    params = dict(params)
+    meta = params.pop("_meta") or {}
+    remote = meta.get("trace") if isinstance(meta, dict) else None
+    if not isinstance(remote, dict) or not remote.get("trace_id"):
+        remote = None
+    return params, remote
+
+
+# ====================
+# OUTPUT
+# ====================
+_write_lock = threading.Lock()
+_fd = None
+
+
+def _open_trace_file():
+    return os.open(TRACE_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def _rotate(fd):
+    """Rotate the full trace file ``fd`` points to; return the fd to write to.
+
+    The agent and the servers share TRACE_FILE. Rotation runs under an
+    exclusive flock, and a process whose file was already rotated by
+    another one (TRACE_FILE is no longer its inode) only reopens it.
+    """
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        try:
+            current = os.stat(TRACE_FILE).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(fd).st_ino:
+            # Keep one previous file
+            os.replace(TRACE_FILE, TRACE_FILE + ".1")
+    finally:
+        os.close(fd)  # also releases the lock
+    return _open_trace_file()
+
+
+def _write(span_, duration, error):
+    global _fd
+    record = {
+        "trace_id": span_.trace_id,
+        "span_id": span_.span_id,
+        "parent_id": span_.parent_id,
+        "name": span_.name,
+        "start": round(span_.start, 6),
+        "duration": round(duration, 6),
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+    }
+    if span_.attrs:
+        record["attrs"] = span_.attrs
+    if error:
+        record["error"] = error
+    line = (json.dumps(record, default=str) + "\n").encode()
+    try:
+        with _write_lock:
+            if _fd is None:
+                os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+                _fd = _open_trace_file()
+            elif os.fstat(_fd).st_size > TRACE_MAX_BYTES:
+                fd, _fd = _fd, None
+                _fd = _rotate(fd)
+            os.write(_fd, line)  # one write per line, so processes can share the file
+    except OSError:
+        pass  # tracing must never break the agent
+
+
+# ====================
+# SUMMARY
+# ====================
+# Span name -> column in the summary. A span counts its self time: its
+# duration minus its children's, so "transport" is what an MCP request took
+# beyond the server's own handling. Concurrent children can add up to more
+# than their parent's wall time.
+CATEGORIES = {
+    "llm": "llm",
+    "tools.discover": "discovery",
+    "approval": "approval",
+    "mcp.request": "transport",
+    "mcp.batch": "transport",
+    "mcp.server": "server",
+    "subprocess.spawn": "spawn",
+    "subprocess.run": "subprocess",
+}
+COLUMNS = ["llm", "discovery", "approval", "transport", "server", "spawn", "subprocess", "other"]
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    return spans
+
+
+def summarize(spans):
+    """``[{"trace_id", "task", "status", "wall", "start", "steps": [row], "total": row}]``.
+
+    A row maps each of COLUMNS to seconds, plus ``wall`` for steps.
+    """
+    by_trace = {}
+    for record in spans:
+        by_trace.setdefault(record["trace_id"], []).append(record)
+
+    traces = []
+    for trace_id, records in by_trace.items():
+        by_id = {r["span_id"]: r for r in records}
+        child_time = {}
+        for r in records:
+            if r.get("parent_id") in by_id:
+                child_time[r["parent_id"]] = child_time.get(r["parent_id"], 0) + r["duration"]
+
+        root = next((r for r in records if r["name"] == "task"), None)
+        steps = {}
+        total = dict.fromkeys(COLUMNS, 0.0)
+        for r in records:
+            self_time = max(0.0, r["duration"] - child_time.get(r["span_id"], 0))
+            column = CATEGORIES.get(r["name"], "other")
+            total[column] += self_time
+            step = _enclosing_step(r, by_id)
+            if step is not None:
+                row = steps.setdefault(step["span_id"], dict.fromkeys(COLUMNS, 0.0))
+                row["step"] = step.get("attrs", {}).get("step")
+                row["wall"] = step["duration"]
+                row[column] += self_time
+        traces.append({
+            "trace_id": trace_id,
+            "task": (root or {}).get("attrs", {}).get("task", "?"),
+            "status": (root or {}).get("attrs", {}).get("status", "?"),
+            "wall": root["duration"] if root else max(r["duration"] for r in records),
+            "start": min(r["start"] for r in records),
+            "steps": sorted(steps.values(), key=lambda row: row.get("step") or 0),
+            "total": total,
+        })
+    traces.sort(key=lambda t: t["start"])
+    return traces
+
+
+def _enclosing_step(record, by_id):
+    seen = 0
+    while record is not None and seen < 1000:
+        if record["name"] == "step":
+            return record
+        record = by_id.get(record.get("parent_id"))
+        seen += 1
+    return None
+
+
+def print_summary(trace):
+    print(f"\nTrace {trace['trace_id'][:12]}  {trace['task'][:60]!r}  "
+          f"{trace['status']}  {trace['wall']:.2f}s, {len(trace['steps'])} step(s)")
+    header = f"  {'step':>5} {'wall':>8}" + "".join(f" {c:>10}" for c in COLUMNS)
+    print(header)
+    for row in trace["steps"]:
+        print(f"  {row.get('step') or '?':>5} {row['wall']:>7.2f}s"
+              + "".join(f" {row[c]:>9.2f}s" for c in COLUMNS))
+    print(f"  {'task':>5} {trace['wall']:>7.2f}s" + "".join(f" {trace['total'][c]:>9.2f}s" for c in COLUMNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time breakdown per step and per task from trace files")
+    parser.add_argument("files", nargs="*", default=[TRACE_FILE], help=f"JSONL trace files (default {TRACE_FILE})")
+    parser.add_argument("--last", type=int, default=5, help="show the most recent N traces")
+    parser.add_argument("--trace", help="show only the trace whose id starts with this")
+    args = parser.parse_args()
+
+    traces = summarize(load_spans(args.files))
+    if args.trace:
+        traces = [t for t in traces if t["trace_id"].startswith(args.trace)]
+    else:
+        traces = traces[-args.last:]
+    if not traces:
+        print("No traces found.")
+    for trace in traces:
+        print_summary(trace)
+
+
+if __name__ == "__main__":
+    main()
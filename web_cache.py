@@ -0,0 +1,455 @@
+import codecs
+import email.utils
+import itertools
+import re
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import DiskCache, content_key
+from config import (
+    WEB_CACHE_DIR, WEB_CACHE_MAX_BYTES, WEB_CACHE_MAX_ENTRY_BYTES,
+    WEB_CACHE_HEURISTIC_FRACTION, WEB_CACHE_HEURISTIC_MAX, WEB_POOL_SIZE,
+    WEB_FETCH_MAX_BYTES, WEB_FETCH_CHUNK_BYTES, HTML_EXTRACT_MAX_CHARS
+)
+from html_extract import HTMLTextExtractor
+
+# ====================
+# PER-HOST SESSIONS
+# ====================
+# One keep-alive session per scheme://host, so repeated requests to a site
+# reuse its connections (and TLS sessions) instead of reconnecting, and a
+# semaphore per host so no more than WEB_POOL_SIZE requests hit it at once.
+_sessions = {}
+_host_slots = {}
+_sessions_lock = threading.Lock()
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def session_for(url: str) -> requests.Session:
+    """Return the pooled session for ``url``'s host, creating it on first use."""
+    origin = _origin(url)
+    session = _sessions.get(origin)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WEB_POOL_SIZE)
+                session.mount(origin + "/", adapter)
+                _sessions[origin] = session
+    return session
+
+
+def host_slot(url: str) -> threading.BoundedSemaphore:
+    """The semaphore limiting concurrent requests to ``url``'s host."""
+    origin = _origin(url)
+    with _sessions_lock:
+        slot = _host_slots.get(origin)
+        if slot is None:
+            slot = _host_slots[origin] = threading.BoundedSemaphore(WEB_POOL_SIZE)
+    return slot
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# ====================
+# FRESHNESS
+# ====================
+def _cache_control(headers):
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _http_date(value):
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, now=None):
+    """Seconds a response may be reused without revalidation.
+
+    Follows Cache-Control max-age, then Expires, then the usual heuristic of
+    a fraction of the time since Last-Modified. ``no-cache`` gives 0 (always
+    revalidate).
+    """
+    now = time.time() if now is None else now
+    directives = _cache_control(headers)
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(0, int(directives["max-age"]))
+        except ValueError:
+            return 0
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        date = _http_date(headers.get("Date")) or now
+        return max(0, expires - date)
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None:
+        return min(max(0, now - last_modified) * WEB_CACHE_HEURISTIC_FRACTION, WEB_CACHE_HEURISTIC_MAX)
+    return 0
+
+
+def _storable(response, body, lifetime):
+    directives = _cache_control(response.headers)
+    return (
+        response.status_code == 200
+        and "no-store" not in directives
+        and response.headers.get("Vary", "").strip() != "*"
+        and not body["timed_out"]
+        and body["bytes_read"] <= WEB_CACHE_MAX_ENTRY_BYTES
+        # Never fresh and nothing to revalidate with: the entry could not be reused
+        and (lifetime > 0 or "ETag" in response.headers or "Last-Modified" in response.headers)
+    )
+
+
+# ====================
+# STREAMED BODIES
+# ====================
+TEXT_TYPES = ("application/json", "application/xml", "application/javascript",
+              "application/x-javascript", "application/ecmascript", "application/xhtml+xml")
+BINARY_MAGIC = (b"%PDF", b"\x89PNG", b"GIF8", b"\xff\xd8\xff", b"PK\x03\x04", b"\x1f\x8b",
+                b"BZh", b"7z\xbc\xaf", b"RIFF", b"OggS", b"ID3", b"\x00\x00\x01\x00", b"wOFF", b"\x7fELF")
+BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+
+
+def _kind_from_type(mime):
+    """"html", "text" or "binary" from a Content-Type, or None when it has to be sniffed."""
+    if not mime or mime in ("application/octet-stream", "binary/octet-stream", "application/unknown"):
+        return None
+    if "html" in mime:
+        return "html"
+    if mime.startswith("text/") or mime in TEXT_TYPES or mime.endswith(("+json", "+xml")):
+        return "text"
+    return "binary"
+
+
+def _sniff(head):
+    if any(head.startswith(bom) for bom, _ in BOMS):
+        return "text"
+    if head.startswith(BINARY_MAGIC) or b"\x00" in head[:1024]:
+        return "binary"
+    start = head[:1024].lstrip().lower()
+    if start.startswith((b"<!doctype html", b"<html")) or b"<head" in start or b"<body" in start:
+        return "html"
+    return "text"
+
+
+def _charset(content_type, head):
+    for bom, name in BOMS:
+        if head.startswith(bom):
+            return name
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.IGNORECASE)
+    candidate = match.group(1) if match else None
+    if candidate is None:
+        match = META_CHARSET.search(head[:2048])
+        candidate = match.group(1).decode("ascii", "ignore") if match else None
+    try:
+        return codecs.lookup(candidate).name if candidate else "utf-8"
+    except LookupError:
+        return "utf-8"
+
+
+def _socket_of(response):
+    """The socket a streamed requests response reads from, or None."""
+    raw = getattr(response, "raw", None)
+    sock = getattr(getattr(raw, "connection", None), "sock", None)
+    if sock is None:
+        # http.client's buffered reader over socket.SocketIO
+        sock = getattr(getattr(getattr(getattr(raw, "_fp", None), "fp", None), "raw", None), "_sock", None)
+    return sock if isinstance(sock, socket.socket) else None
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+def _chunks_until(chunks, sock, deadline):
+    """Yield from ``chunks`` without reading from ``sock`` past ``deadline``.
+
+    A socket timeout cannot do this: urllib3 keeps reading until a chunk is
+    full, so a server trickling bytes never trips it. Instead a timer shuts
+    the socket down at the deadline, and the read it breaks ends the stream
+    with a final None.
+    """
+    timer = None
+    if sock is not None:
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), _shutdown, (sock,))
+        timer.daemon = True
+        timer.start()
+    try:
+        while True:
+            try:
+                data = next(chunks)
+            except StopIteration:
+                return
+            except (requests.exceptions.RequestException, OSError):
+                if time.monotonic() < deadline:
+                    raise
+                yield None
+                return
+            yield data
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+def read_body(response, max_bytes=WEB_FETCH_MAX_BYTES, max_chars=HTML_EXTRACT_MAX_CHARS,
+              extract=True, deadline=None) -> dict:
+    """Stream a ``stream=True`` response's body and stop as early as possible.
+
+    Binary bodies (by Content-Type, or sniffed from the first chunk when the
+    type is missing or generic) are not downloaded. Text is decoded
+    incrementally with the charset from the header, a BOM or a ``<meta>``
+    tag. HTML goes through HTMLTextExtractor as it arrives; reading stops
+    once it has ``max_chars`` of content (``max_chars`` of text for other
+    types), after ``max_bytes`` decoded bytes or at ``deadline`` (a
+    time.monotonic() value, which also cuts off a read still waiting on the
+    socket). The response is closed, even if reading fails. With ``extract=False``
+    HTML is only read (up to ``max_bytes``) and ``extracted`` is None, for
+    the caller to extract elsewhere.
+
+    Returns ``{"text", "extracted", "content_type", "binary", "complete",
+    "timed_out", "bytes_read", "bytes_transferred", "declared_length"}``. ``bytes_read``
+    counts decoded bytes; ``bytes_transferred`` counts bytes off the wire
+    (compressed, if the server compressed) and compares to
+    ``declared_length`` (Content-Length, None if not sent).
+    """
+    content_type = response.headers.get("Content-Type", "")
+    declared = response.headers.get("Content-Length", "")
+    chunks = None
+    try:
+        chunks = response.iter_content(WEB_FETCH_CHUNK_BYTES)
+        if deadline is not None:
+            chunks = _chunks_until(chunks, _socket_of(response), deadline)
+        kind = _kind_from_type(content_type.split(";")[0].strip().lower())
+        head = b""
+        pieces, received, chars, complete, timed_out = [], 0, 0, False, False
+        if kind is None or (kind != "binary" and "charset=" not in content_type.lower()):
+            head = next(chunks, b"")
+            if head is None:
+                head, timed_out = b"", True
+            kind = kind or _sniff(head)
+
+        extractor = None
+        if kind != "binary" and not timed_out:
+            decoder = codecs.getincrementaldecoder(_charset(content_type, head))(errors="replace")
+            extractor = HTMLTextExtractor(max_chars) if kind == "html" and extract else None
+            for data in itertools.chain([head] if head else [], chunks):
+                if data is None:
+                    timed_out = True
+                    break
+                data = data[:max_bytes - received]
+                received += len(data)
+                text = decoder.decode(data)
+                pieces.append(text)
+                if extractor is not None:
+                    done = extractor.feed(text)
+                elif kind == "text":
+                    chars += len(text)
+                    done = chars >= max_chars
+                else:
+                    done = False
+                timed_out = deadline is not None and time.monotonic() >= deadline
+                if done or timed_out or received >= max_bytes:
+                    break
+            else:
+                complete = True
+                pieces.append(decoder.decode(b"", final=True))
+                if extractor is not None:
+                    extractor.feed(pieces[-1])
+                    extractor.close()
+        else:
+            received = len(head)
+
+        try:
+            transferred = response.raw.tell()
+        except (AttributeError, TypeError):
+            transferred = 0
+        if not transferred:
+            # urllib3 does not count chunked reads; fall back to the decoded size
+            transferred = received
+    finally:
+        if chunks is not None:
+            chunks.close()  # stops the deadline timer
+        response.close()
+
+    text = None if kind == "binary" else "".join(pieces)
+    if extractor is not None:
+        extracted = extractor.result()
+    elif kind == "html":
+        extracted = None
+    else:
+        extracted = "" if text is None else text[:max_chars]
+    return {
+        "text": text,
+        "extracted": extracted,
+        "content_type": content_type,
+        "binary": kind == "binary",
+        "complete": complete,
+        "timed_out": timed_out,
+        "bytes_read": received,
+        "bytes_transferred": transferred,
+        "declared_length": int(declared) if declared.isdigit() else None,
+    }
+
+
+# ====================
+# HTTP CACHE
+# ====================
+class HTTPCache:
+    """Disk-backed cache for GET requests.
+
+    Entries keep the decoded body, the validators (ETag, Last-Modified) and
+    a freshness deadline computed from the caching headers. A fresh entry
+    is served without touching the network. A stale one is revalidated
+    with a conditional request, and a ``304`` only refreshes the deadline.
+    Values derived from the body (such as extracted text) are stored in the
+    same entry with ``set_derived()`` and dropped when the body changes.
+    The store is LRU-bounded by ``max_bytes``.
+    """
+
+    def __init__(self, directory=WEB_CACHE_DIR, max_bytes=WEB_CACHE_MAX_BYTES):
+        self.disk = DiskCache(directory, max_bytes) if directory else None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "revalidated": 0, "misses": 0}
+
+    @staticmethod
+    def key(url):
+        return content_key("GET", url)
+
+    def fetch(self, url, headers=None, timeout=15, max_bytes=WEB_FETCH_MAX_BYTES,
+              max_chars=HTML_EXTRACT_MAX_CHARS, extract=True) -> dict:
+        """GET ``url`` through the cache.
+
+        ``timeout`` bounds the whole fetch, including the wait for one of
+        the host's WEB_POOL_SIZE slots. The body is streamed with
+        read_body(), so the entry's ``text`` may be a prefix of the document
+        (``complete`` is False) and its ``derived["text"]`` holds the
+        extracted text (absent for HTML with ``extract=False``). Returns the
+        entry plus ``cache``: ``"hit"``, ``"revalidated"``, ``"miss"`` or
+        ``"bypass"`` (not stored). Raises for HTTP errors like
+        raise_for_status, and TimeoutError if no slot frees up in time.
+        """
+        key = self.key(url)
+        entry = self.disk.get(key) if self.disk is not None else None
+        now = time.time()
+        if entry is not None and entry["fresh_until"] > now:
+            self._count("hits")
+            return dict(entry, cache="hit")
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry["headers"].get("ETag"):
+                request_headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+
+        deadline = time.monotonic() + timeout
+        slot = host_slot(url)
+        if not slot.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection to {_origin(url)} within {timeout}s")
+        try:
+            remaining = max(0.1, deadline - time.monotonic())
+            response = session_for(url).get(url, headers=request_headers, timeout=remaining, stream=True)
+            if response.status_code == 304 and entry is not None:
+                response.close()
+                return self._revalidated(key, entry, response)
+            if response.status_code >= 400:
+                response.close()
+                response.raise_for_status()
+            body = read_body(response, max_bytes, max_chars, extract, deadline)
+        finally:
+            slot.release()
+
+        self._count("misses")
+        lifetime = freshness_lifetime(response.headers)
+        entry = {
+            "url": url,
+            "status_code": response.status_code,
+            "text": body["text"],
+            "headers": {name: response.headers[name] for name in
+                        ("Content-Type", "Cache-Control", "Expires", "Date", "ETag", "Last-Modified")
+                        if name in response.headers},
+            "fresh_until": time.time() + lifetime,
+            "binary": body["binary"],
+            "complete": body["complete"],
+            "timed_out": body["timed_out"],
+            "bytes_transferred": body["bytes_transferred"],
+            "declared_length": body["declared_length"],
+            "derived": {} if body["extracted"] is None else {"text": body["extracted"]},
+        }
+        if self.disk is None or not _storable(response, body, lifetime):
+            return dict(entry, cache="bypass")
+        self.disk.set(key, entry)
+        return dict(entry, cache="miss")
+
+    def _revalidated(self, key, entry, response):
+        self._count("revalidated")
+        merged = dict(entry["headers"])
+        for name in ("Cache-Control", "Expires", "Date", "ETag", "Last-Modified"):
+            if name in response.headers:
+                merged[name] = response.headers[name]
+        entry["headers"] = merged
+        entry["fresh_until"] = time.time() + freshness_lifetime(merged)
+        self.disk.set(key, entry)
+        return dict(entry, cache="revalidated")
+
+    def set_derived(self, url, name, value):
+        """Store a value computed from ``url``'s current cached body."""
+        if self.disk is None:
+            return
+        key = self.key(url)
+        entry = self.disk.get(key)
+        if entry is not None:
+            entry["derived"][name] = value
+            self.disk.set(key, entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> HTTPCache:
+    """Return the shared HTTPCache (a pass-through one if WEB_CACHE_DIR is None)."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = HTTPCache()
+    return _default_cache